@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Batch Query Runner
+Answers a JSONL file of queries with one model/index load: queries are embedded in
+batches, answered through answer_query with bounded concurrency, and written out as
+JSONL in input order. Run it with: python query_llm.py --batch queries.jsonl
+"""
+
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import query_llm
+
+def read_queries(path):
+    """Each line is {"query": "...", "id": ...} or a bare JSON string"""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict) or not isinstance(item.get("query"), str):
+                raise ValueError(f"Line {line_number}: expected a string or an object with a 'query' string")
+            items.append(item)
+    return items
+
+def prefetch_embeddings(queries):
+    """Embed every query up front in batches; retrieval then hits the embedding cache"""
+    from llama_index.core import Settings
+    embed_model = Settings.embed_model
+    if hasattr(embed_model, "get_query_embedding_batch"):
+        embed_model.get_query_embedding_batch(queries)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_batch(input_path, output=None, concurrency=4):
+    """Answer every query in input_path, streaming JSONL results in input order"""
+    output = output or sys.stdout
+    items = read_queries(input_path)
+    started = time.perf_counter()
+
+    index = query_llm.load_runtime()
+    cache = None
+    if index is not None:
+        cache = query_llm.response_cache_from_env()
+        if cache is not None:
+            cache.set_index_version(query_llm.storage_version(query_llm.STORAGE_DIR))
+
+        # Structured questions never reach retrieval, so only the rest are embedded
+        pending = [item["query"] for item in items if query_llm.structured_answer(item["query"]) is None]
+        if pending:
+            try:
+                prefetch_embeddings(pending)
+            except Exception as e:
+                print(f"Embedding prefetch failed, embedding per query: {e}", file=sys.stderr)
+    setup_seconds = time.perf_counter() - started
+
+    def answer(item):
+        query_started = time.perf_counter()
+        # No deadline: queued behind the other workers for the LLM, queries would degrade
+        # depending on --concurrency, and batch output must match single queries
+        result = query_llm.answer_query(item["query"], index, cache, deadline_seconds=0)
+        result["latency_ms"] = round((time.perf_counter() - query_started) * 1000, 2)
+        if "id" in item:
+            result["id"] = item["id"]
+        return result
+
+    latencies = []
+    modes = {}
+    answered_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        # map() yields in input order, so each result is written as soon as all earlier ones are done
+        for result in executor.map(answer, items):
+            latencies.append(result["latency_ms"])
+            modes[result["mode"]] = modes.get(result["mode"], 0) + 1
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    answer_seconds = time.perf_counter() - answered_started
+
+    if cache is not None:
+        cache.save()
+
+    return {
+        "queries": len(items),
+        "concurrency": concurrency,
+        "setup_seconds": round(setup_seconds, 3),
+        "answer_seconds": round(answer_seconds, 3),
+        "throughput_qps": round(len(items) / answer_seconds, 3) if answer_seconds > 0 else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies) if latencies else 0.0
+        },
+        "modes": modes,
+        "stages_ms": query_llm.METRICS.stage_summary(),
+        "cache": cache.stats() if cache is not None else None
+    }
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Benchmark Suite
+Runs the golden question set (golden_questions.jsonl) through the same answer path as
+the CLI and worker and reports latency percentiles, throughput, peak RSS, index build
+time and size, retrieval recall@k and how many expected figures the answers contain.
+With --offline a local Ollama stub (ollama_stub.py) stands in for Mistral, so the suite
+runs without a model server or network. The report is sorted JSON, so two runs can be
+compared with a plain diff or with --baseline.
+
+Run it with: python benchmark_suite.py --offline --output bench.json
+Compare a change: python benchmark_suite.py --offline --baseline bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+GOLDEN_FILE = "golden_questions.jsonl"
+RECALL_K = (1, 3, 5)
+
+def read_golden(path):
+    """
+    Each line is {"id", "query", "expected_sources": [{"source", "contains"}], "figures"},
+    optionally with "structured": whether the CSV tables (true) or the transcripts (false)
+    should answer it
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not isinstance(item.get("id"), str) or not isinstance(item.get("query"), str):
+                raise ValueError(f"Line {line_number}: expected 'id' and 'query' strings")
+            item.setdefault("expected_sources", [])
+            item.setdefault("figures", [])
+            questions.append(item)
+    return questions
+
+def normalise(text):
+    return " ".join(str(text).split()).lower()
+
+def figure_text(text):
+    # "₹1,02,569", "102,569" and "102569" all match the figure 102,569
+    return normalise(text).replace(",", "")
+
+def peak_rss_mb(who="self"):
+    """Peak resident set size of this process (or its finished children), or None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 1e6, 1)
+
+def directory_bytes(path):
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return sum(entry.stat().st_size for entry in path.rglob("*") if entry.is_file())
+
+def run_build(env):
+    """Time a full rebuild of the vector and lexical indexes in a child process"""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "build_index.py", "--full"], env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        print(completed.stdout, file=sys.stderr)
+        raise SystemExit("❌ build_index.py --full failed")
+    return round(seconds, 3), peak_rss_mb("children")
+
+def make_retriever(query_llm, index, top_k):
+    """Return query -> [(source, text)] for the retrieval path the answers will use"""
+    if index is not None:
+        from llama_index.core.schema import QueryBundle
+        from hybrid_retrieval import HybridRetriever, retrieval_config_from_env
+        config = retrieval_config_from_env()
+        config.update(top_k=top_k, candidate_k=max(config["candidate_k"], top_k))
+        retriever = HybridRetriever(index, **config)
+
+        def retrieve(query):
+            return [(result.node.metadata.get("file_name"), result.node.get_content())
+                    for result in retriever.retrieve(QueryBundle(query))]
+        return retrieve
+
+    def retrieve(query):
+        passages = query_llm.search_transcripts(query, top_k, query_llm.question_filters(query))
+        return [(passage.get("source"), passage["text"]) for passage in passages]
+    return retrieve
+
+def first_hit(expected, retrieved):
+    """1-based rank of the first retrieved passage containing the expected text, or None"""
+    wanted = normalise(expected["contains"])
+    for rank, (source, text) in enumerate(retrieved, start=1):
+        if (not expected.get("source") or source == expected["source"]) and wanted in normalise(text):
+            return rank
+    return None
+
+def evaluate_retrieval(questions, retrieve, percentile):
+    ranks = {}
+    latencies = []
+    for question in questions:
+        if not question["expected_sources"]:
+            continue
+        started = time.perf_counter()
+        retrieved = retrieve(question["query"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        ranks[question["id"]] = [first_hit(expected, retrieved) for expected in question["expected_sources"]]
+
+    expected_total = sum(len(found) for found in ranks.values())
+    summary = {
+        f"recall@{k}": round(sum(1 for found in ranks.values() for rank in found if rank and rank <= k)
+                             / expected_total, 4) if expected_total else None
+        for k in RECALL_K
+    }
+    summary["mrr"] = round(sum(1 / rank for found in ranks.values() for rank in found if rank)
+                           / expected_total, 4) if expected_total else None
+    summary["questions"] = len(ranks)
+    summary["latency_ms"] = {"p50": round(percentile(latencies, 0.50), 2),
+                             "p95": round(percentile(latencies, 0.95), 2)}
+    return summary, ranks
+
+def answer_all(query_llm, questions, index, runs, concurrency, deadline_seconds=None):
+    """Answer every question runs times; returns (results in order, wall seconds)"""
+    work = [question for _ in range(runs) for question in questions]
+
+    def answer(question):
+        started = time.perf_counter()
+        result = query_llm.answer_query(question["query"], index, deadline_seconds=deadline_seconds)
+        return result, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(answer, work))
+    return results, time.perf_counter() - started
+
+def figure_check(question, response):
+    text = figure_text(response)
+    found = [figure for figure in question["figures"] if figure_text(figure) in text]
+    return found, [figure for figure in question["figures"] if figure not in found]
+
+def latency_summary(values, percentile):
+    return {
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "max": round(max(values), 2) if values else 0.0
+    }
+
+def degraded_outcome(result):
+    """How an answer was degraded by the deadline: partial, cache, lexical, or None"""
+    if result.get("partial"):
+        return "partial"
+    if result.get("cache_tier") == "degraded":
+        return "cache"
+    if result.get("fallback_reason") == "deadline_exceeded":
+        return "lexical"
+    return None
+
+def flatten(report, prefix=""):
+    """Numeric leaves of a report as {"a.b.c": value}, skipping per-question rows"""
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if key == "questions" and isinstance(value, list):
+            continue
+        if isinstance(value, dict):
+            values.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+def compare(baseline, report):
+    """Print metrics that changed between a baseline report and this one"""
+    old, new = flatten(baseline), flatten(report)
+    for name in sorted(set(old) | set(new)):
+        before, after = old.get(name), new.get(name)
+        if before == after:
+            continue
+        change = f" ({(after - before) / before:+.1%})" if before and after is not None else ""
+        print(f"  {name}: {before} -> {after}{change}", file=sys.stderr)
+
+def run_suite(args):
+    if args.offline:
+        from ollama_stub import start_stub
+        stub, url = start_stub(first_token_ms=args.stub_first_token_ms, token_ms=args.stub_token_ms,
+                               parallel=args.stub_parallel)
+        os.environ["OLLAMA_URL"] = url
+        # Use the locally cached embedding model instead of trying to download one
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        print(f"🧪 Ollama stub on {url}", file=sys.stderr)
+    if args.deadline is not None:
+        os.environ["QUERY_DEADLINE_SECONDS"] = str(args.deadline)
+
+    questions = read_golden(args.golden)
+    index_report = {}
+    if args.build:
+        print("🔄 Rebuilding indexes (build_index.py --full)...", file=sys.stderr)
+        index_report["build_seconds"], index_report["build_peak_rss_mb"] = run_build(dict(os.environ))
+
+    # Imported after OLLAMA_URL and the deadline are set, since query_llm reads them at import
+    import query_llm
+    from batch_query import percentile
+    from lexical_index import INDEX_DIR as LEXICAL_INDEX_DIR, build_lexical_index
+    from metrics import METRICS
+
+    started = time.perf_counter()
+    build_lexical_index()
+    index_report["lexical_build_seconds"] = round(time.perf_counter() - started, 3)
+
+    METRICS.reset()
+    started = time.perf_counter()
+    index = query_llm.load_runtime()
+    index_report["load_seconds"] = round(time.perf_counter() - started, 3)
+    index_report["storage_mb"] = round(directory_bytes(query_llm.STORAGE_DIR) / 1e6, 3)
+    index_report["lexical_mb"] = round(directory_bytes(LEXICAL_INDEX_DIR) / 1e6, 3)
+    mode = "ai" if index is not None else "fallback"
+    print(f"📚 Runtime loaded in {index_report['load_seconds']}s ({mode} mode)", file=sys.stderr)
+
+    retrieval, ranks = evaluate_retrieval(questions, make_retriever(query_llm, index, max(RECALL_K)), percentile)
+    retrieval["retriever"] = "hybrid" if index is not None else "lexical"
+
+    # Sequential pass for per-question latency, then a concurrent pass for throughput. The
+    # concurrent pass has no deadline, or answers would degrade while queued for the LLM and
+    # the throughput would count cheap fallbacks
+    sequential, _ = answer_all(query_llm, questions, index, args.runs, 1)
+    concurrent, concurrent_seconds = answer_all(query_llm, questions, index, args.runs, args.concurrency,
+                                                deadline_seconds=0)
+
+    rows = []
+    modes = {}
+    degraded = {}
+    misrouted = []
+    figures_expected = figures_found = 0
+    for position, question in enumerate(questions):
+        samples = sequential[position::len(questions)]
+        result = samples[-1][0]
+        found, missing = figure_check(question, result["response"])
+        figures_expected += len(question["figures"])
+        figures_found += len(found)
+        modes[result["mode"]] = modes.get(result["mode"], 0) + 1
+        outcome = degraded_outcome(result)
+        if outcome:
+            degraded[outcome] = degraded.get(outcome, 0) + 1
+        if "structured" in question and question["structured"] != (result["mode"] == "structured"):
+            misrouted.append(question["id"])
+        rows.append({
+            "id": question["id"],
+            "mode": result["mode"],
+            "fallback_reason": result.get("fallback_reason"),
+            "latency_ms": round(sorted(latency for _, latency in samples)[len(samples) // 2], 2),
+            "degraded": degraded_outcome(result),
+            "retrieved_rank": ranks.get(question["id"]),
+            "figures_missing": missing
+        })
+
+    latencies = [latency for _, latency in sequential]
+    return {
+        "suite": {
+            "golden_file": os.path.basename(args.golden),
+            "golden_sha256": hashlib.sha256(Path(args.golden).read_bytes()).hexdigest()[:16],
+            "questions": len(questions),
+            "runs": args.runs,
+            "concurrency": args.concurrency,
+            "offline": args.offline,
+            "deadline_seconds": query_llm.QUERY_DEADLINE_SECONDS
+        },
+        "environment": {
+            "python": sys.version.split()[0],
+            "mode": mode,
+            "fallback_reason": query_llm.RUNTIME_FALLBACK[0],
+            "retrieval": {key: os.environ[key] for key in sorted(os.environ) if key.startswith(("RETRIEVAL_", "RERANK_"))},
+            "embedding": {key: os.environ[key] for key in sorted(os.environ) if key.startswith("EMBED_")},
+            "vector_store": {key: os.environ[key] for key in sorted(os.environ) if key.startswith("VECTOR_")}
+        },
+        "index": index_report,
+        "latency_ms": latency_summary(latencies, percentile),
+        "throughput_qps": round(len(concurrent) / concurrent_seconds, 3) if concurrent_seconds > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "retrieval": retrieval,
+        "answers": {
+            "modes": modes,
+            "degraded": degraded,
+            "misrouted": misrouted,
+            "figure_recall": round(figures_found / figures_expected, 4) if figures_expected else None
+        },
+        "stages_ms": {stage: {key: summary[key] for key in ("count", "p50", "p95")}
+                      for stage, summary in METRICS.stage_summary().items()},
+        "questions": rows
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Bajaj Finserv AI Assistant - Benchmark Suite")
+    parser.add_argument("--golden", default=GOLDEN_FILE, help="Golden question set (JSONL)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Answer with a local Ollama stub instead of Mistral; no network needed")
+    parser.add_argument("--stub-first-token-ms", type=float, default=50.0,
+                        help="Simulated time to first token of the offline stub")
+    parser.add_argument("--stub-token-ms", type=float, default=5.0,
+                        help="Simulated time per generated token of the offline stub")
+    parser.add_argument("--stub-parallel", type=int, default=1,
+                        help="Answers the offline stub generates at once (Ollama's default is 1)")
+    parser.add_argument("--deadline", type=float,
+                        help="Override QUERY_DEADLINE_SECONDS, e.g. to see how answers degrade")
+    parser.add_argument("--build", action="store_true",
+                        help="Time a full index rebuild first (re-embeds unless vectors are cached)")
+    parser.add_argument("--runs", type=int, default=1, help="Times each question is answered")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel queries in the throughput pass")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier report to print metric changes against")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    print(f"⏱️  p50 {report['latency_ms']['p50']} ms, p95 {report['latency_ms']['p95']} ms, "
+          f"{report['throughput_qps']} q/s, recall@3 {report['retrieval']['recall@3']}, "
+          f"figures {report['answers']['figure_recall']}", file=sys.stderr)
+    if report["answers"]["misrouted"]:
+        print(f"🔀 Misrouted: {', '.join(report['answers']['misrouted'])}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 Changes since {args.baseline}:", file=sys.stderr)
+        compare(baseline, report)
+
+if __name__ == "__main__":
+    main()
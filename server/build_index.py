@@ -1,39 +1,66 @@
 #!/usr/bin/env python3
 """
 Bajaj Finserv AI Assistant - Index Builder
-This script creates a vector index from PDF/text documents for offline querying
+This script creates a vector index from PDF/text documents for offline querying.
+llama_index, numpy and the embedding model are only imported once the manifest shows
+something to embed, so a rebuild with no source changes finishes almost immediately.
 """
 
 import os
 import sys
+import json
+import argparse
+import hashlib
 from pathlib import Path
 
-try:
-    from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Settings
-    from llama_index.core.storage.storage_context import StorageContext
-    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-    from llama_index.llms.ollama import Ollama
+from index_settings import (
+    ANN_METHODS, EMBED_BACKENDS as BACKENDS, VECTOR_BACKENDS, VECTOR_DTYPES,
+    embedding_config_from_env, vector_store_config_from_env
+)
+from lexical_index import INDEX_DIR as LEXICAL_INDEX_DIR, TRANSCRIPTS_DIR, build_lexical_index, load_current_index
+from transcript_parser import is_transcript, parse_transcript, part_subsidiaries
+
+STORAGE_DIR = "./storage"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+# Manifests written before the vector store was configurable used the JSON store
+VECTOR_DEFAULTS = {"vector_store": "simple", "vector_dtype": "float32", "vector_ann": "none"}
+
+def import_ai_libraries():
+    """Check the llama_index packages import, printing install instructions if not"""
+    try:
+        import llama_index.core  # noqa: F401
+        import embedding_pipeline  # noqa: F401
+        import matrix_vector_store  # noqa: F401
+    except ImportError as e:
+        print(f"❌ Import error: {e}")
+        print("Please install required packages:")
+        print("pip install llama-index llama-index-llms-ollama llama-index-embeddings-huggingface")
+        return False
     print("✅ LlamaIndex imports successful")
-except ImportError as e:
-    print(f"❌ Import error: {e}")
-    print("Please install required packages:")
-    print("pip install llama-index llama-index-llms-ollama llama-index-embeddings-huggingface")
-    sys.exit(1)
+    return True
 
-def setup_llm_and_embeddings():
+def setup_llm_and_embeddings(embed_config):
     """Configure LLM and embedding models"""
     try:
+        from llama_index.core import Settings
+        from llama_index.llms.ollama import Ollama
+        from embedding_pipeline import create_embed_model
+        
         # Configure Ollama LLM
         llm = Ollama(model="mistral", request_timeout=120.0)
         
-        # Configure HuggingFace embeddings (smaller, faster model)
-        embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # Configure HuggingFace embeddings (smaller, faster model) behind the embedding cache
+        embed_model = create_embed_model(**embed_config)
         
         # Set global settings
         Settings.llm = llm
         Settings.embed_model = embed_model
-        Settings.chunk_size = 512
-        Settings.chunk_overlap = 50
+        Settings.chunk_size = CHUNK_SIZE
+        Settings.chunk_overlap = CHUNK_OVERLAP
         
         print("✅ LLM and embeddings configured successfully")
         return True
@@ -41,38 +68,301 @@ def setup_llm_and_embeddings():
         print(f"❌ Error configuring models: {e}")
         return False
 
-def build_index():
-    """Build vector index from documents"""
+def fingerprint(data):
+    """Return the SHA-256 hex digest of bytes or text"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def scan_sources(transcripts_dir):
+    """Map each source file name to the fingerprint of its contents"""
+    sources = {}
+    for path in sorted(Path(transcripts_dir).iterdir()):
+        if path.is_file() and not path.name.startswith("."):
+            sources[path.name] = fingerprint(path.read_bytes())
+    return sources
+
+def manifest_path(storage_dir):
+    return os.path.join(storage_dir, MANIFEST_FILE)
+
+def manifest_settings(embed_config, store_config):
+    """Settings that must match for stored chunks and vectors to be reused"""
+    return {
+        "version": MANIFEST_VERSION,
+        "embed_model": embed_config["model_name"],
+        "embed_backend": embed_config["backend"],
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "vector_store": store_config["backend"],
+        "vector_dtype": store_config["dtype"],
+        "vector_ann": store_config["ann"]
+    }
+
+def load_manifest(storage_dir, embed_config, store_config):
+    """Load the build manifest, or None if the stored index cannot be reused"""
+    try:
+        with open(manifest_path(storage_dir), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    # Chunks are only comparable when built with the same settings
+    settings = manifest_settings(embed_config, store_config)
+    if any(manifest.get(key, VECTOR_DEFAULTS.get(key)) != value for key, value in settings.items()):
+        return None
+    return manifest
+
+def save_manifest(storage_dir, embed_config, store_config, files):
+    """Persist per-file and per-chunk fingerprints next to the index"""
+    manifest = dict(manifest_settings(embed_config, store_config), files=files)
+    with open(manifest_path(storage_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def transcript_node(file_name, turns, text):
+    """A chunk of one or more speaker turns, tagged for metadata filtering at query time"""
+    from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+    
+    metadata = {
+        "file_name": file_name,
+        "quarter": turns[0]["quarter"],
+        "fiscal_quarter": turns[0]["fiscal_quarter"],
+        "fiscal_year": turns[0]["fiscal_year"],
+        "section": turns[0]["section"],
+        "speakers": ", ".join(dict.fromkeys(turn["speaker"] for turn in turns if turn["speaker"])),
+        "subsidiaries": sorted({name for turn in turns for name in turn["subsidiaries"]})
+    }
+    node = TextNode(
+        text=text,
+        metadata=metadata,
+        # Quarter, speakers and subsidiaries help both embedding and the LLM; the rest is for filters
+        excluded_embed_metadata_keys=["file_name", "fiscal_quarter", "fiscal_year", "section"],
+        excluded_llm_metadata_keys=["file_name", "fiscal_quarter", "fiscal_year", "section"]
+    )
+    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=file_name)
+    return node
+
+def transcript_nodes(path, splitter, tokenizer):
+    """
+    Chunk a transcript on speaker turns. Turns of the same Q&A exchange (an analyst's
+    question and its answers) are packed together up to CHUNK_SIZE tokens; a chunk never
+    spans two exchanges, and turns longer than CHUNK_SIZE are split on sentences.
+    """
+    file_name = Path(path).name
+    nodes = []
+    group, group_text, group_tokens, group_key = [], [], 0, None
+    
+    def flush():
+        if group:
+            nodes.append(transcript_node(file_name, group, "\n".join(group_text)))
+    
+    for turn in parse_transcript(path):
+        if turn["section"] == "presentation" and turn["speaker"] in (None, "Moderator"):
+            continue  # call header and operator instructions
+        text = f"{turn['speaker']}: {turn['text']}" if turn["speaker"] else turn["text"]
+        tokens = len(tokenizer(text))
+        key = (turn["quarter"], turn["section"], turn["exchange"] if turn["section"] == "qa" else id(turn))
+        
+        if key != group_key or group_tokens + tokens > CHUNK_SIZE:
+            flush()
+            group, group_text, group_tokens, group_key = [], [], 0, key
+        
+        if tokens > CHUNK_SIZE:
+            for part in splitter.split_text(text):
+                nodes.append(transcript_node(file_name, [dict(turn, subsidiaries=part_subsidiaries(turn, part))], part))
+            group_key = None
+            continue
+        group.append(turn)
+        group_text.append(text)
+        group_tokens += tokens
+    flush()
+    return nodes
+
+def chunk_files(transcripts_dir, file_names):
+    """Load and chunk the given files, giving every chunk a content-derived id"""
+    from llama_index.core import SimpleDirectoryReader
+    from llama_index.core.node_parser import SentenceSplitter
+    from llama_index.core.schema import MetadataMode
+    from llama_index.core.utils import get_tokenizer
+    
+    splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    nodes = []
+    
+    # Earnings call transcripts are chunked on speaker turns; anything else on sentences
+    other_files = []
+    tokenizer = get_tokenizer()
+    for name in file_names:
+        if is_transcript(name):
+            nodes.extend(transcript_nodes(os.path.join(transcripts_dir, name), splitter, tokenizer))
+        else:
+            other_files.append(os.path.join(transcripts_dir, name))
+    
+    if other_files:
+        documents = SimpleDirectoryReader(input_files=other_files).load_data()
+        
+        # A stable document id per file (and page, for PDFs) lets chunks be traced back to their source
+        for document in documents:
+            document.id_ = document.metadata.get("file_name", document.id_)
+            if "page_label" in document.metadata:
+                document.id_ += f"#{document.metadata['page_label']}"
+        nodes.extend(splitter.get_nodes_from_documents(documents))
+    
+    chunks = {}
+    for node in nodes:
+        file_name = node.metadata.get("file_name", node.ref_doc_id)
+        # Hash what is embedded, so a change to a chunk's tags re-embeds it too
+        chunk_hash = fingerprint(node.get_content(metadata_mode=MetadataMode.EMBED))
+        file_chunks = chunks.setdefault(file_name, {})
+        
+        # Identical text in the same file still needs distinct ids
+        node_id = f"{file_name}:{chunk_hash[:24]}"
+        occurrence = 1
+        while node_id in file_chunks:
+            occurrence += 1
+            node_id = f"{file_name}:{chunk_hash[:24]}:{occurrence}"
+        node.id_ = node_id
+        file_chunks[node_id] = (chunk_hash, node)
+    return chunks
+
+def build_full(transcripts_dir, storage_dir, sources, embed_config, store_config):
+    """Embed every chunk and write a fresh index"""
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from matrix_vector_store import create_vector_store, remove_unused_vectors
+    
+    print(f"📂 Loading documents from {transcripts_dir}...")
+    chunks = chunk_files(transcripts_dir, list(sources))
+    nodes = [node for file_chunks in chunks.values() for _, node in file_chunks.values()]
+    
+    if not nodes:
+        print("❌ No documents found in transcripts directory")
+        return False
+    
+    print(f"✅ Loaded {len(sources)} documents ({len(nodes)} chunks)")
+    
+    # Create index
+    print(f"🔄 Creating vector index ({store_config['backend']} vector store)...")
+    storage_context = StorageContext.from_defaults(vector_store=create_vector_store(store_config))
+    index = VectorStoreIndex(nodes, storage_context=storage_context, show_progress=True)
+    
+    # Save index
+    print(f"💾 Saving index to {storage_dir}...")
+    index.storage_context.persist(persist_dir=storage_dir)
+    remove_unused_vectors(storage_dir, store_config)
+    save_manifest(storage_dir, embed_config, store_config, {
+        name: {
+            "sha256": sources[name],
+            "chunks": {node_id: chunk_hash for node_id, (chunk_hash, _) in chunks.get(name, {}).items()}
+        }
+        for name in sources
+    })
+    return True
+
+def diff_sources(sources, manifest):
+    """Compare current source fingerprints with the manifest: (added, changed, removed)"""
+    old_files = manifest.get("files", {})
+    added = [name for name in sources if name not in old_files]
+    changed = [name for name in sources if name in old_files and old_files[name]["sha256"] != sources[name]]
+    removed = [name for name in old_files if name not in sources]
+    return added, changed, removed
+
+def build_incremental(transcripts_dir, storage_dir, sources, manifest, embed_config, store_config,
+                      added, changed, removed):
+    """Re-embed only new or changed chunks and drop vectors for removed files"""
+    from llama_index.core import StorageContext, load_index_from_storage
+    from matrix_vector_store import load_vector_store
+    
+    old_files = manifest.get("files", {})
+    print(f"📂 Sources: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+    
+    storage_context = StorageContext.from_defaults(persist_dir=storage_dir,
+                                                   vector_store=load_vector_store(storage_dir, store_config))
+    index = load_index_from_storage(storage_context)
+    
+    files = {name: entry for name, entry in old_files.items() if name not in removed}
+    stale_ids = [node_id for name in removed for node_id in old_files[name]["chunks"]]
+    new_nodes = []
+    reused = 0
+    
+    chunks = chunk_files(transcripts_dir, added + changed) if (added or changed) else {}
+    for name in added + changed:
+        file_chunks = chunks.get(name, {})
+        previous = old_files.get(name, {}).get("chunks", {})
+        
+        for node_id, (chunk_hash, node) in file_chunks.items():
+            if previous.get(node_id) == chunk_hash:
+                reused += 1
+            else:
+                new_nodes.append(node)
+        stale_ids.extend(node_id for node_id in previous if node_id not in file_chunks)
+        
+        files[name] = {
+            "sha256": sources[name],
+            "chunks": {node_id: chunk_hash for node_id, (chunk_hash, _) in file_chunks.items()}
+        }
+    
+    if stale_ids:
+        print(f"🗑️  Removing {len(stale_ids)} stale chunks...")
+        index.delete_nodes(stale_ids, delete_from_docstore=True)
+    
+    if new_nodes:
+        print(f"🔄 Embedding {len(new_nodes)} new or changed chunks ({reused} reused)...")
+        index.insert_nodes(new_nodes, show_progress=True)
+    
+    print(f"💾 Saving index to {storage_dir}...")
+    index.storage_context.persist(persist_dir=storage_dir)
+    save_manifest(storage_dir, embed_config, store_config, files)
+    return True
+
+def report_embedding_throughput():
+    """Print chunks/sec for the embedding stage of this build"""
+    from llama_index.core import Settings
+    
+    stats = getattr(Settings.embed_model, "stats", None)
+    if not stats or not stats["texts"]:
+        return
+    rate = stats["texts"] / stats["seconds"] if stats["seconds"] > 0 else float("inf")
+    print(f"⚡ Embedded {stats['texts']} chunks in {stats['seconds']:.2f}s "
+          f"({rate:.1f} chunks/sec, {stats['cache_hits']} from cache, {stats['embedded']} computed)")
+
+def build_index(full=False, embed_config=None, store_config=None):
+    """Build vector index from documents, reusing unchanged chunks when possible"""
     try:
         # Set up paths
-        transcripts_dir = "./transcripts"
-        storage_dir = "./storage"
+        transcripts_dir = TRANSCRIPTS_DIR
+        storage_dir = STORAGE_DIR
         
         # Check if transcripts directory exists
         if not os.path.exists(transcripts_dir):
             print(f"❌ Transcripts directory not found: {transcripts_dir}")
             return False
-            
-        # Load documents
-        print(f"📂 Loading documents from {transcripts_dir}...")
-        documents = SimpleDirectoryReader(transcripts_dir).load_data()
         
-        if not documents:
+        sources = scan_sources(transcripts_dir)
+        if not sources:
             print("❌ No documents found in transcripts directory")
             return False
-            
-        print(f"✅ Loaded {len(documents)} documents")
         
-        # Create index
-        print("🔄 Creating vector index...")
-        index = VectorStoreIndex.from_documents(documents, show_progress=True)
+        embed_config = embed_config or embedding_config_from_env()
+        store_config = store_config or vector_store_config_from_env()
+        manifest = None if full else load_manifest(storage_dir, embed_config, store_config)
+        if manifest is not None:
+            added, changed, removed = diff_sources(sources, manifest)
+            if not (added or changed or removed):
+                print("✅ Index is up to date, nothing to rebuild")
+                return True
         
-        # Save index
-        print(f"💾 Saving index to {storage_dir}...")
-        index.storage_context.persist(persist_dir=storage_dir)
+        # Only pay for imports and model setup when there is something to embed
+        if not import_ai_libraries() or not setup_llm_and_embeddings(embed_config):
+            return False
         
-        print("✅ Index created and saved successfully!")
-        return True
+        if manifest is None:
+            built = build_full(transcripts_dir, storage_dir, sources, embed_config, store_config)
+        else:
+            built = build_incremental(transcripts_dir, storage_dir, sources, manifest, embed_config, store_config,
+                                      added, changed, removed)
+        
+        if built:
+            print("✅ Index created and saved successfully!")
+            report_embedding_throughput()
+        return built
         
     except Exception as e:
         print(f"❌ Error building index: {e}")
@@ -83,13 +373,51 @@ def main():
     print("🚀 Bajaj Finserv AI Assistant - Index Builder")
     print("=" * 50)
     
-    # Setup models
-    if not setup_llm_and_embeddings():
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Build the transcript vector index")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and re-embed every chunk")
+    parser.add_argument("--embed-batch-size", type=int, help="Chunks per embedding batch")
+    parser.add_argument("--embed-threads", type=int, help="CPU threads used by the embedding model")
+    parser.add_argument("--embed-processes", type=int, help="Worker processes used for embedding")
+    parser.add_argument("--embed-backend", choices=BACKENDS,
+                        help="Embedding runtime: torch, onnx or onnx-int8 (quantised CPU)")
+    parser.add_argument("--no-embed-cache", action="store_true",
+                        help="Do not read or write the on-disk embedding cache")
+    parser.add_argument("--vector-store", choices=VECTOR_BACKENDS,
+                        help="simple (llama_index JSON) or matrix (memory-mapped embedding matrix)")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES,
+                        help="Matrix store element type; int8 is a quarter of the size")
+    parser.add_argument("--vector-ann", choices=ANN_METHODS,
+                        help="Matrix store search: none (exact), ivf or hnsw (needs hnswlib)")
+    args = parser.parse_args()
     
-    # Build index
-    if not build_index():
+    # Command line options override EMBED_* environment variables
+    embed_config = embedding_config_from_env()
+    overrides = {
+        "batch_size": args.embed_batch_size,
+        "threads": args.embed_threads,
+        "processes": args.embed_processes,
+        "backend": args.embed_backend
+    }
+    embed_config.update({key: value for key, value in overrides.items() if value is not None})
+    if args.no_embed_cache:
+        embed_config["cache_path"] = None
+    
+    store_config = vector_store_config_from_env()
+    store_overrides = {"backend": args.vector_store, "dtype": args.vector_dtype, "ann": args.vector_ann}
+    store_config.update({key: value for key, value in store_overrides.items() if value is not None})
+    
+    # Build index (models are set up only if chunks need embedding)
+    if not build_index(full=args.full, embed_config=embed_config, store_config=store_config):
         sys.exit(1)
+    
+    # The BM25 index used by the fallback path is rebuilt when its sources change
+    lexical_index = load_current_index()
+    if lexical_index is not None:
+        print(f"✅ Lexical index is up to date ({lexical_index.n_docs} passages)")
+    else:
+        passages = build_lexical_index()
+        print(f"✅ Lexical index rebuilt with {passages} passages in {LEXICAL_INDEX_DIR}")
         
     print("\n🎉 Index building completed successfully!")
     print("You can now run query_llm.py to ask questions about the earnings transcripts.")
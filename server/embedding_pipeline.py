@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Embedding Pipeline
+Configurable embedding stage (batch size, CPU threads/processes, ONNX/int8 backend)
+with a persistent cache keyed by (model, chunk text hash), shared by index builds and queries.
+"""
+
+import os
+import atexit
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from typing import Any, List, Optional
+
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from index_settings import DEFAULT_CACHE_PATH, DEFAULT_EMBED_MODEL, EMBED_BACKENDS as BACKENDS, ONNX_FILES
+from metrics import METRICS
+
+# Chunk batches of embed_batch_size sent to each pooled worker per call
+POOL_BATCHES_PER_PROCESS = 4
+
+def text_hash(text):
+    """SHA-256 of the exact text that is embedded"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """On-disk cache of embedding vectors keyed by (model key, text hash)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model_key, hashes):
+        """Return {text_hash: vector} for the hashes present in the cache"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_key, *batch]
+                ).fetchall()
+                for digest, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[digest] = vector.tolist()
+        return found
+
+    def put_many(self, model_key, items):
+        """Store (text_hash, vector) pairs"""
+        rows = [(model_key, digest, array("f", vector).tobytes()) for digest, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that only computes vectors missing from the cache"""
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _model_key: str = PrivateAttr()
+    _query_key: str = PrivateAttr()
+    _stats: dict = PrivateAttr()
+
+    def __init__(self, inner, cache, model_key, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs
+        )
+        self._inner = inner
+        self._cache = cache
+        self._model_key = model_key
+        # Queries share cache entries with chunks unless the model prepends a different instruction
+        query_instruction = getattr(inner, "query_instruction", None)
+        text_instruction = getattr(inner, "text_instruction", None)
+        self._query_key = model_key if query_instruction == text_instruction else f"{model_key}|query"
+        self._stats = {"texts": 0, "cache_hits": 0, "embedded": 0, "seconds": 0.0}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def stats(self):
+        return dict(self._stats)
+
+    def _embed_cached(self, texts, model_key, embed_fn):
+        started = time.perf_counter()
+        hashes = [text_hash(text) for text in texts]
+        cached = self._cache.get_many(model_key, hashes)
+
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = list(zip(missing.keys(), vectors))
+            self._cache.put_many(model_key, computed)
+            cached.update(computed)
+
+        self._stats["texts"] += len(texts)
+        self._stats["cache_hits"] += len(texts) - len(missing)
+        self._stats["embedded"] += len(missing)
+        self._stats["seconds"] += time.perf_counter() - started
+        METRICS.inc("cache_lookups_total", len(texts) - len(missing), cache="embedding", result="hit")
+        METRICS.inc("cache_lookups_total", len(missing), cache="embedding", result="miss")
+        return [cached[digest] for digest in hashes]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed_cached(
+            [query], self._query_key,
+            lambda texts: [self._inner._get_query_embedding(text) for text in texts]
+        )[0]
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries, computing the cache misses in batches of embed_batch_size"""
+        def embed(texts):
+            # HuggingFaceEmbedding encodes a list in embed_batch_size batches with the query prompt
+            if hasattr(self._inner, "_embed"):
+                return self._inner._embed(texts, prompt_name="query")
+            return [self._inner._get_query_embedding(text) for text in texts]
+
+        return self._embed_cached(queries, self._query_key, embed)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached(texts, self._model_key, self._inner._get_text_embeddings)
+
+class PooledEmbedding(BaseEmbedding):
+    """
+    Encodes chunks on a pool of CPU worker processes. The pool is started once, on the
+    first batch, and reused until exit; queries are embedded in this process.
+    """
+
+    # Read by CachedEmbedding to decide whether queries share cache entries with chunks
+    query_instruction: Optional[str] = None
+    text_instruction: Optional[str] = None
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _processes: int = PrivateAttr()
+    _pool: Any = PrivateAttr(default=None)
+
+    def __init__(self, inner, processes, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            # Each call hands every worker several batches, so dispatch overhead stays small
+            embed_batch_size=inner.embed_batch_size * processes * POOL_BATCHES_PER_PROCESS,
+            query_instruction=getattr(inner, "query_instruction", None),
+            text_instruction=getattr(inner, "text_instruction", None),
+            **kwargs
+        )
+        self._inner = inner
+        self._processes = processes
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        # The SentenceTransformer behind HuggingFaceEmbedding (llama-index-embeddings-huggingface>=0.2.0)
+        model = self._inner._model
+        if self._pool is None:
+            self._pool = model.start_multi_process_pool(target_devices=["cpu"] * self._processes)
+            atexit.register(self.close)
+        return model.encode_multi_process(
+            texts, self._pool, prompt_name="text", batch_size=self._inner.embed_batch_size,
+            normalize_embeddings=self._inner.normalize
+        ).tolist()
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._inner._model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+def model_key(model_name, backend="torch"):
+    """Identifier for vectors produced by a model/backend pair"""
+    return model_name if backend == "torch" else f"{model_name}|{backend}"
+
+def create_embed_model(model_name=DEFAULT_EMBED_MODEL, batch_size=32, threads=None,
+                       processes=None, backend="torch", cache_path=DEFAULT_CACHE_PATH):
+    """
+    Create the HuggingFace embedding model, optionally wrapped in the on-disk cache.
+    A cache_path of None or "off" disables caching. processes > 1 encodes chunks on a
+    persistent worker pool (index builds only; queries are single texts).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if threads:
+        # Must be set before torch/onnxruntime create their thread pools
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+        import torch
+        torch.set_num_threads(threads)
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    kwargs = {"embed_batch_size": batch_size}
+    if processes and processes > 1:
+        kwargs["device"] = "cpu"
+    if backend in ONNX_FILES:
+        kwargs["backend"] = "onnx"
+        kwargs["device"] = "cpu"
+        kwargs["model_kwargs"] = {"file_name": ONNX_FILES[backend]}
+
+    embed_model = HuggingFaceEmbedding(model_name=model_name, **kwargs)
+    if processes and processes > 1:
+        embed_model = PooledEmbedding(embed_model, processes)
+
+    if not cache_path or cache_path == "off":
+        return embed_model
+    return CachedEmbedding(embed_model, EmbeddingCache(cache_path), model_key(model_name, backend))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Hybrid Retrieval
+Fuses dense (vector) and sparse (BM25) results with reciprocal rank fusion, then
+optionally reranks a wider candidate set with a CPU cross-encoder. Both searches are
+first narrowed to the quarter or subsidiary the question names, when it names one.
+"""
+
+import os
+import hashlib
+import threading
+from typing import List
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+from lexical_index import TRANSCRIPTS_DIR, search_transcripts
+from metrics import METRICS
+from transcript_parser import question_filters
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Standard RRF damping constant; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+_RERANKERS = {}
+_RERANKER_LOCK = threading.Lock()
+
+def retrieval_config_from_env():
+    """Retrieval settings from RETRIEVAL_* environment variables"""
+    return {
+        "mode": os.environ.get("RETRIEVAL_MODE", "hybrid"),
+        "candidate_k": int(os.environ.get("RETRIEVAL_CANDIDATES", "10")),
+        "top_k": int(os.environ.get("RETRIEVAL_TOP_K", "3")),
+        "rerank": os.environ.get("RETRIEVAL_RERANK", "0").lower() in ("1", "true", "yes", "on"),
+        "rerank_model": os.environ.get("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        "prefilter": os.environ.get("RETRIEVAL_PREFILTER", "1").lower() in ("1", "true", "yes", "on")
+    }
+
+def get_reranker(model_name):
+    """Load a cross-encoder once per process"""
+    with _RERANKER_LOCK:
+        if model_name not in _RERANKERS:
+            from sentence_transformers import CrossEncoder
+            _RERANKERS[model_name] = CrossEncoder(model_name, device="cpu")
+        return _RERANKERS[model_name]
+
+def passage_node(passage):
+    """Wrap a lexical passage as a node the response synthesizer can use"""
+    return TextNode(
+        id_=f"lexical:{passage['source']}:{hashlib.sha256(passage['text'].encode('utf-8')).hexdigest()[:16]}",
+        text=passage["text"],
+        metadata={
+            "file_name": passage["source"],
+            "quarter": passage.get("quarter"),
+            "fiscal_quarter": passage.get("fiscal_quarter"),
+            "fiscal_year": passage.get("fiscal_year"),
+            "section": passage.get("section"),
+            # Same keys as build_index.transcript_node, so excerpt headers name the speaker either way
+            "speakers": passage.get("speaker") or "",
+            "subsidiaries": passage.get("subsidiaries", [])
+        },
+        excluded_embed_metadata_keys=["file_name", "fiscal_quarter", "fiscal_year", "section"],
+        excluded_llm_metadata_keys=["file_name", "fiscal_quarter", "fiscal_year", "section"]
+    )
+
+def metadata_filters(filters):
+    """Vector store filters equivalent to transcript_parser.matches_filters"""
+    return MetadataFilters(filters=[
+        MetadataFilter(key=key, value=values,
+                       operator=FilterOperator.ANY if key == "subsidiaries" else FilterOperator.IN)
+        for key, values in filters.items()
+    ])
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=RRF_K):
+    """Fuse ranked node lists; nodes whose text overlaps are treated as the same hit"""
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, node_with_score in enumerate(ranked):
+            text = node_with_score.node.get_content()
+            # A BM25 passage is usually contained in a larger vector chunk
+            key = next((existing for existing in fused
+                        if text[:200] in fused[existing][0].node.get_content()
+                        or fused[existing][0].node.get_content()[:200] in text), None)
+            if key is None:
+                key = node_with_score.node.node_id
+                fused[key] = [node_with_score, 0.0]
+            fused[key][1] += 1.0 / (rrf_k + rank + 1)
+
+    ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)
+    return [NodeWithScore(node=node_with_score.node, score=score) for node_with_score, score in ranked]
+
+class HybridRetriever(BaseRetriever):
+    """Dense + BM25 retrieval with RRF fusion and an optional cross-encoder rerank"""
+
+    def __init__(self, index, candidate_k=10, top_k=3, rerank=False,
+                 rerank_model=DEFAULT_RERANK_MODEL, mode="hybrid", prefilter=True):
+        super().__init__()
+        # Fusion and reranking both need a wider dense candidate set than the final k
+        wide = mode == "hybrid" or rerank
+        self._index = index
+        self._dense_k = candidate_k if wide else top_k
+        self._dense = index.as_retriever(similarity_top_k=self._dense_k)
+        self.prefilter = prefilter
+        self.filters = {}
+        self.candidate_k = candidate_k
+        self.top_k = top_k
+        self.rerank = rerank
+        self.rerank_model = rerank_model
+        self.mode = mode
+        self.timings = {}
+
+    def dense_retrieve(self, query_bundle, filters):
+        """Vector search restricted to matching chunks, or over everything if none match"""
+        if filters:
+            retriever = self._index.as_retriever(similarity_top_k=self._dense_k, filters=metadata_filters(filters))
+            nodes = retriever.retrieve(query_bundle)
+            METRICS.inc("prefilter_total", outcome="applied" if nodes else "no_match")
+            if nodes:
+                return nodes
+        return self._dense.retrieve(query_bundle)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        timings = {}
+        # Match on the user's question, not the instruction-wrapped prompt sent to the LLM
+        query_text = " ".join(query_bundle.embedding_strs)
+        self.filters = question_filters(query_text) if self.prefilter else {}
+
+        with METRICS.span("dense", timings):
+            dense = self.dense_retrieve(query_bundle, self.filters)
+        candidates = dense
+
+        if self.mode == "hybrid":
+            with METRICS.span("sparse", timings):
+                # Only the corpus the vector index covers, so both lists rank the same documents
+                sparse = [NodeWithScore(node=passage_node(passage), score=passage["score"])
+                          for passage in search_transcripts(query_text, self.candidate_k, self.filters,
+                                                            (TRANSCRIPTS_DIR,))]
+
+            with METRICS.span("fusion", timings):
+                candidates = reciprocal_rank_fusion([dense, sparse])[:self.candidate_k]
+
+        if self.rerank and candidates:
+            with METRICS.span("rerank", timings):
+                reranker = get_reranker(self.rerank_model)
+                scores = reranker.predict([(query_text, node.node.get_content()) for node in candidates])
+                candidates = [NodeWithScore(node=node.node, score=float(score))
+                              for node, score in sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)]
+
+        self.timings = timings
+        return candidates[:self.top_k]
@@ -6,7 +6,7 @@ const path = require('path');
 const csv = require('csv-parser');
 const moment = require('moment');
 const _ = require('lodash');
-const { exec } = require('child_process');
+const { execFile, spawn } = require('child_process');
 const BajajAI = require('./services/BajajAI');
 
 dotenv.config();
@@ -22,6 +22,69 @@ app.use(cors());
 app.use(express.json());
 app.use(express.static('public'));
 
+// Python query worker (python query_llm.py --serve); when unset or unreachable
+// every chat message falls back to spawning query_llm.py. A busy worker's 503 is
+// passed on to the client instead
+const QUERY_WORKER_URL = process.env.QUERY_WORKER_URL;
+const QUERY_TIMEOUT_MS = parseInt(process.env.QUERY_TIMEOUT_MS || '30000', 10);
+
+// Past QUERY_DEADLINE_SECONDS Python returns its best available answer (cached, partial or
+// lexical). It has to arrive before the timeout above, so CLI runs get a deadline that
+// leaves a margin for the response to come back; start the worker with one below it too
+const DEADLINE_MARGIN_MS = 10000;
+const CLI_ENV = {
+    ...process.env,
+    QUERY_DEADLINE_SECONDS: process.env.QUERY_DEADLINE_SECONDS ||
+        String(Math.max(1, (QUERY_TIMEOUT_MS - DEADLINE_MARGIN_MS) / 1000))
+};
+
+// True when the worker could not be reached at all. A busy (503) or slow worker is up, so
+// spawning a cold CLI process for those would only add load the worker's limit is there to shed
+function workerUnreachable(error) {
+    return error.status === undefined && error.name !== 'TimeoutError';
+}
+
+// Run a query through the worker, or the CLI script if the worker is not running.
+// The callback receives (error, stdout, stderr) like child_process.execFile; worker HTTP
+// errors carry error.status
+function runQuery(message, callback) {
+    const runCli = () => {
+        // No shell, and '--' so a message such as "--serve" or "$(...)" is only ever the question
+        execFile('python', ['query_llm.py', '--', message], {
+            cwd: __dirname,
+            env: CLI_ENV,
+            timeout: QUERY_TIMEOUT_MS
+        }, callback);
+    };
+
+    if (!QUERY_WORKER_URL) {
+        return runCli();
+    }
+
+    fetch(`${QUERY_WORKER_URL}/query`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ query: message }),
+        signal: AbortSignal.timeout(QUERY_TIMEOUT_MS)
+    })
+        .then(async (workerRes) => {
+            const body = await workerRes.text();
+            if (!workerRes.ok) {
+                const workerError = new Error(`Query worker returned ${workerRes.status}: ${body}`);
+                workerError.status = workerRes.status;
+                throw workerError;
+            }
+            callback(null, body, '');
+        })
+        .catch((workerError) => {
+            if (!workerUnreachable(workerError)) {
+                return callback(workerError, '', '');
+            }
+            console.warn(`Query worker unavailable, using CLI: ${workerError.message}`);
+            runCli();
+        });
+}
+
 // AI Chat endpoint using Python LLM
 app.post('/api/chat', (req, res) => {
     const { message } = req.body;
@@ -33,18 +96,17 @@ app.post('/api/chat', (req, res) => {
         });
     }
 
-    // Escape message for shell execution
-    const escapedMessage = message.replace(/"/g, '\\"');
-    
-    // Execute Python query script
-    const pythonCommand = `python query_llm.py "${escapedMessage}"`;
-    
     console.log(`🤖 Processing AI query: ${message}`);
     
-    exec(pythonCommand, { 
-        cwd: __dirname,
-        timeout: 30000 // 30 second timeout
-    }, (error, stdout, stderr) => {
+    runQuery(message, (error, stdout, stderr) => {
+        if (error && error.status === 503) {
+            console.warn(`AI Query Rejected: ${error.message}`);
+            return res.status(503).json({
+                error: 'Worker busy',
+                message: 'Too many concurrent queries, please retry'
+            });
+        }
+
         if (error) {
             console.error(`AI Query Error: ${error.message}`);
             
@@ -70,6 +132,8 @@ app.post('/api/chat', (req, res) => {
                 response: aiResult.response || aiResult.message || stdout.trim(),
                 confidence: aiResult.confidence || 0.8,
                 source: aiResult.source || 'Bajaj Finance AI Assistant',
+                mode: aiResult.mode,
+                cached: aiResult.cached || false,
                 query: message,
                 timestamp: new Date().toISOString()
             });
@@ -86,6 +150,122 @@ app.post('/api/chat', (req, res) => {
     });
 });
 
+// Streaming chat endpoint: forwards newline-delimited JSON events (sources, token, done)
+// from the Python query engine as they are produced
+app.post('/api/chat/stream', (req, res) => {
+    const { message } = req.body;
+    
+    if (!message || typeof message !== 'string') {
+        return res.status(400).json({ 
+            error: 'Invalid request', 
+            message: 'Message field is required and must be a string' 
+        });
+    }
+
+    console.log(`🤖 Streaming AI query: ${message}`);
+
+    const startStream = () => {
+        if (!res.headersSent) {
+            res.setHeader('Content-Type', 'application/x-ndjson');
+            res.setHeader('Cache-Control', 'no-cache');
+            res.flushHeaders();
+        }
+    };
+
+    // Answer with the basic response system as the same sources/token/done events
+    const streamFallback = (reason) => {
+        startStream();
+        const response = generateBasicResponse(message);
+        res.write(JSON.stringify({ type: 'sources', sources: [] }) + '\n');
+        res.write(JSON.stringify({ type: 'token', token: response }) + '\n');
+        res.end(JSON.stringify({
+            type: 'done',
+            response,
+            confidence: 0.5,
+            source: 'Basic Response System',
+            mode: 'fallback',
+            fallback_reason: reason,
+            query: message
+        }) + '\n');
+    };
+
+    const streamCli = () => {
+        startStream();
+        // "--" stops option parsing so messages starting with "-" reach the script intact
+        const child = spawn('python', ['query_llm.py', '--stream', '--', message], { cwd: __dirname, env: CLI_ENV });
+        const timer = setTimeout(() => child.kill(), QUERY_TIMEOUT_MS);
+        let produced = false;
+        let finished = false;
+
+        // 'error' (e.g. python not on PATH) and 'close' can both fire; answer once
+        const finish = (failure) => {
+            if (finished) {
+                return;
+            }
+            finished = true;
+            clearTimeout(timer);
+            if (failure && !produced) {
+                console.error(`AI Stream Error: ${failure}`);
+                return streamFallback('cli_failed');
+            }
+            res.end();
+        };
+
+        child.stdout.on('data', (chunk) => {
+            produced = true;
+            res.write(chunk);
+        });
+        child.stderr.on('data', (data) => console.warn(`AI Stream Warning: ${data}`));
+        child.on('error', (error) => finish(error.message));
+        child.on('close', (code, signal) => finish(code === 0 ? null : `query_llm.py exited with ${code ?? signal}`));
+        res.on('close', () => child.kill());
+    };
+
+    if (!QUERY_WORKER_URL) {
+        return streamCli();
+    }
+
+    let forwarded = false;
+    fetch(`${QUERY_WORKER_URL}/query/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ query: message }),
+        signal: AbortSignal.timeout(QUERY_TIMEOUT_MS)
+    })
+        .then(async (workerRes) => {
+            if (!workerRes.ok || !workerRes.body) {
+                const workerError = new Error(`Query worker returned ${workerRes.status}`);
+                workerError.status = workerRes.status;
+                throw workerError;
+            }
+            startStream();
+            for await (const chunk of workerRes.body) {
+                forwarded = true;
+                res.write(chunk);
+            }
+            res.end();
+        })
+        .catch((workerError) => {
+            if (forwarded) {
+                console.error(`AI Stream Error: ${workerError.message}`);
+                return res.end();
+            }
+            if (workerError.status === 503) {
+                console.warn(`AI Stream Rejected: ${workerError.message}`);
+                return res.status(503).json({
+                    error: 'Worker busy',
+                    message: 'Too many concurrent queries, please retry'
+                });
+            }
+            if (!workerUnreachable(workerError)) {
+                console.error(`AI Stream Error: ${workerError.message}`);
+                return streamFallback(workerError.name === 'TimeoutError' ? 'worker_timeout' : 'worker_failed');
+            }
+            console.warn(`Query worker unavailable, using CLI: ${workerError.message}`);
+            streamCli();
+        });
+});
+
 // In-memory storage for data
 let stockPriceData = [];
 let transcriptData = '';
@@ -248,18 +428,17 @@ app.post('/api/chat', (req, res) => {
         });
     }
 
-    // Escape message for shell execution
-    const escapedMessage = message.replace(/"/g, '\\"');
-    
-    // Execute Python query script
-    const pythonCommand = `python query_llm.py "${escapedMessage}"`;
-    
     console.log(`🤖 Processing AI query: ${message}`);
     
-    exec(pythonCommand, { 
-        cwd: __dirname,
-        timeout: 30000 // 30 second timeout
-    }, async (error, stdout, stderr) => {
+    runQuery(message, async (error, stdout, stderr) => {
+        if (error && error.status === 503) {
+            console.warn(`AI Query Rejected: ${error.message}`);
+            return res.status(503).json({
+                error: 'Worker busy',
+                message: 'Too many concurrent queries, please retry'
+            });
+        }
+
         if (error) {
             console.error(`AI Query Error: ${error.message}`);
             
@@ -299,6 +478,8 @@ app.post('/api/chat', (req, res) => {
                 response: aiResult.response || aiResult.message || stdout.trim(),
                 confidence: aiResult.confidence || 0.8,
                 source: aiResult.source || 'Bajaj Finance AI Assistant',
+                mode: aiResult.mode,
+                cached: aiResult.cached || false,
                 query: message,
                 timestamp: new Date().toISOString()
             });
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Index Settings
+Embedding and vector store settings read from EMBED_* and VECTOR_* environment
+variables. Kept free of llama_index, torch and numpy imports so build_index.py can
+compare them with the build manifest before deciding whether anything needs loading.
+"""
+
+import os
+
+DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CACHE_PATH = "./cache/embeddings.sqlite"
+
+# ONNX weights shipped with sentence-transformers models; int8 uses the dynamically quantised export
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_qint8_avx512_vnni.onnx"
+}
+EMBED_BACKENDS = ("torch",) + tuple(ONNX_FILES)
+
+VECTOR_BACKENDS = ("simple", "matrix")
+VECTOR_DTYPES = ("float32", "int8")
+ANN_METHODS = ("none", "ivf", "hnsw")
+
+def embedding_config_from_env():
+    """Embedding settings from EMBED_* environment variables"""
+    return {
+        "model_name": os.environ.get("EMBED_MODEL", DEFAULT_EMBED_MODEL),
+        "batch_size": int(os.environ.get("EMBED_BATCH_SIZE", "32")),
+        "threads": int(os.environ.get("EMBED_THREADS", "0")) or None,
+        "processes": int(os.environ.get("EMBED_PROCESSES", "0")) or None,
+        "backend": os.environ.get("EMBED_BACKEND", "torch"),
+        "cache_path": os.environ.get("EMBED_CACHE_PATH", DEFAULT_CACHE_PATH)
+    }
+
+def vector_store_config_from_env():
+    """Vector store settings from VECTOR_* environment variables"""
+    return {
+        "backend": os.environ.get("VECTOR_STORE", "simple"),
+        "dtype": os.environ.get("VECTOR_DTYPE", "float32"),
+        "ann": os.environ.get("VECTOR_ANN", "none"),
+        "nprobe": int(os.environ.get("VECTOR_NPROBE", "8"))
+    }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Lexical Retriever
+BM25 over the earnings call transcripts for the no-LLM fallback path. The inverted
+index is stored as flat uint32/uint16 arrays and memory-mapped at startup, so it
+answers in milliseconds without importing torch or llama_index.
+
+Build it with: python lexical_index.py --build
+Search it with: python lexical_index.py "housing NPA"
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import shutil
+import hashlib
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+
+from transcript_parser import matches_filters, parse_transcript, part_subsidiaries
+
+# The vector index (build_index.py) covers TRANSCRIPTS_DIR; the fallback also searches ./data
+TRANSCRIPTS_DIR = "./transcripts"
+SOURCE_DIRS = (TRANSCRIPTS_DIR, "./data")
+INDEX_DIR = "./lexical_index"
+FORMAT_VERSION = 3
+
+DIR_FD_SUPPORTED = os.open in os.supports_dir_fd
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Speaker turns longer than this are split into overlapping windows
+PASSAGE_WORDS = 120
+PASSAGE_STRIDE = 100
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our ours out over own same she should
+so some such than that the their theirs them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with
+would you your yours tell give show please
+""".split())
+
+TOKEN_RE = re.compile(r"\d[\d,]*(?:\.\d+)?|[a-z]+")
+
+def tokenize(text):
+    """Lowercase word and number tokens; digit grouping commas are dropped so ₹1,02,569 matches 102569"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        token = token.replace(",", "")
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def split_passages(path):
+    """Split a transcript into speaker-turn passages tagged with quarter, speaker and subsidiaries"""
+    passages = []
+    for turn in parse_transcript(path):
+        words = turn["text"].split()
+        for start in range(0, max(1, len(words) - (PASSAGE_WORDS - PASSAGE_STRIDE)), PASSAGE_STRIDE):
+            text = " ".join(words[start:start + PASSAGE_WORDS])
+            passages.append({
+                "text": text,
+                "quarter": turn["quarter"],
+                "fiscal_quarter": turn["fiscal_quarter"],
+                "fiscal_year": turn["fiscal_year"],
+                "speaker": turn["speaker"],
+                "section": turn["section"],
+                "subsidiaries": part_subsidiaries(turn, text),
+                "source": turn["source"],
+                "source_dir": os.path.normpath(os.path.dirname(path))
+            })
+    return passages
+
+def source_files(source_dirs=SOURCE_DIRS):
+    files = []
+    for directory in source_dirs:
+        if os.path.isdir(directory):
+            files.extend(sorted(str(path) for path in Path(directory).glob("*.txt")))
+    return files
+
+def sources_fingerprint(files):
+    """Cheap staleness check from file names, sizes and modification times"""
+    digest = hashlib.sha256()
+    for path in files:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+def build_lexical_index(source_dirs=SOURCE_DIRS, index_dir=INDEX_DIR):
+    """
+    Build the BM25 index. Postings for each term are stored contiguously:
+    doc ids in docs.bin (uint32) and term frequencies in tfs.bin (uint16).
+    """
+    files = source_files(source_dirs)
+    passages = [passage for path in files for passage in split_passages(path)]
+
+    postings = {}
+    doc_lengths = array("I")
+    for doc_id, passage in enumerate(passages):
+        tokens = tokenize(passage["text"])
+        doc_lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            postings.setdefault(token, []).append((doc_id, min(tf, 65535)))
+
+    docs, tfs, lexicon = array("I"), array("H"), {}
+    for term in sorted(postings):
+        lexicon[term] = [len(docs), len(postings[term])]
+        for doc_id, tf in postings[term]:
+            docs.append(doc_id)
+            tfs.append(tf)
+
+    # Write into a private staging directory and swap it in whole: processes that have the
+    # current index mapped keep reading the old files, and no reader sees a mix of the two
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(index_dir)}-", suffix=".tmp")
+    try:
+        for name, values in (("docs.bin", docs), ("tfs.bin", tfs), ("doclens.bin", doc_lengths)):
+            with open(os.path.join(staging, name), "wb") as f:
+                values.tofile(f)
+        with open(os.path.join(staging, "passages.json"), "w", encoding="utf-8") as f:
+            json.dump(passages, f)
+        with open(os.path.join(staging, "lexicon.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "fingerprint": sources_fingerprint(files),
+                "n_docs": len(passages),
+                "avg_doc_length": (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0,
+                "terms": lexicon
+            }, f)
+        swap_directory(staging, index_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return len(passages)
+
+def swap_directory(staging, path):
+    """Move staging to path, replacing any existing directory there"""
+    previous = staging + ".old"
+    try:
+        os.replace(path, previous)
+    except FileNotFoundError:
+        previous = None
+    try:
+        os.replace(staging, path)
+    except OSError:
+        # Another process swapped in its own build first; it covers the same sources
+        if not os.path.isdir(path):
+            raise
+    if previous:
+        # Unlinked files stay readable through existing mmaps and open handles
+        shutil.rmtree(previous, ignore_errors=True)
+
+class LexicalIndex:
+    """Read-only BM25 index backed by memory-mapped postings arrays"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self._files = []
+        # Open every file through one directory handle, so a rebuild swapping the directory
+        # mid-load cannot pair this lexicon with another build's postings
+        dir_fd = os.open(index_dir, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)) if DIR_FD_SUPPORTED else None
+        try:
+            with self._open("lexicon.json", "r", dir_fd, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.version = meta.get("version")
+            self.fingerprint = meta["fingerprint"]
+            self.n_docs = meta["n_docs"]
+            self.avg_doc_length = meta["avg_doc_length"] or 1.0
+            self.terms = meta["terms"]
+            self.docs = self._map("docs.bin", "I", dir_fd)
+            self.tfs = self._map("tfs.bin", "H", dir_fd)
+            self.doc_lengths = self._map("doclens.bin", "I", dir_fd)
+            # Opened now, read on first use
+            self._passages_file = self._open("passages.json", "r", dir_fd, encoding="utf-8")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        self._passages = None
+        self._passages_lock = threading.Lock()
+
+    def _open(self, name, mode, dir_fd, **kwargs):
+        if dir_fd is None:
+            return open(os.path.join(self.index_dir, name), mode, **kwargs)
+        return open(name, mode, opener=lambda path, flags: os.open(path, flags, dir_fd=dir_fd), **kwargs)
+
+    def _map(self, name, typecode, dir_fd):
+        f = self._open(name, "rb", dir_fd)
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return memoryview(array(typecode))
+        self._files.append(f)
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+    @property
+    def passages(self):
+        # Passage text is only needed once there are hits to return
+        with self._passages_lock:
+            if self._passages is None:
+                with self._passages_file as f:
+                    self._passages = json.load(f)
+        return self._passages
+
+    def score(self, query):
+        """Return {doc_id: BM25 score} for passages sharing at least one term with the query"""
+        scores = {}
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            for i in range(offset, offset + df):
+                doc_id = self.docs[i]
+                tf = self.tfs[i]
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, top_k=3, filters=None, source_dirs=None):
+        """
+        Top passages as dicts with text, quarter, speaker, source and score, optionally only
+        those matching filters and from files in source_dirs
+        """
+        scores = self.score(query)
+        if filters or source_dirs:
+            passages = self.passages
+            dirs = {os.path.normpath(directory) for directory in source_dirs} if source_dirs else None
+            scores = {doc_id: score for doc_id, score in scores.items()
+                      if (not filters or matches_filters(passages[doc_id], filters))
+                      and (dirs is None or passages[doc_id]["source_dir"] in dirs)}
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [dict(self.passages[doc_id], score=round(score, 4)) for doc_id, score in ranked]
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def load_current_index(index_dir=INDEX_DIR, source_dirs=SOURCE_DIRS):
+    """The stored index, or None if it is missing or older than the sources"""
+    try:
+        index = LexicalIndex(index_dir)
+    except (OSError, ValueError, KeyError):
+        return None
+    if index.version != FORMAT_VERSION or index.fingerprint != sources_fingerprint(source_files(source_dirs)):
+        return None
+    return index
+
+def get_lexical_index(index_dir=INDEX_DIR, source_dirs=SOURCE_DIRS):
+    """Load the index, rebuilding it first if it is missing or older than the sources"""
+    global _INDEX
+    if _INDEX is not None:
+        return _INDEX
+
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            index = load_current_index(index_dir, source_dirs)
+            if index is None:
+                build_lexical_index(source_dirs, index_dir)
+                index = LexicalIndex(index_dir)
+            _INDEX = index
+    return _INDEX
+
+def search_transcripts(query, top_k=3, filters=None, source_dirs=None):
+    """
+    Search the transcripts, restricted to passages matching filters (see
+    transcript_parser.question_filters) unless none do, and to files in source_dirs
+    when given. Returns [] if the index cannot be built or loaded.
+    """
+    try:
+        index = get_lexical_index()
+        results = index.search(query, top_k, filters, source_dirs) if filters else []
+        return results or index.search(query, top_k, source_dirs=source_dirs)
+    except (OSError, ValueError, KeyError):
+        return []
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        count = build_lexical_index()
+        print(f"✅ Lexical index built with {count} passages in {INDEX_DIR}")
+        return
+
+    query = " ".join(sys.argv[1:])
+    print(json.dumps(search_transcripts(query, top_k=5), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
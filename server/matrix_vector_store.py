@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Matrix Vector Store
+A llama_index vector store that keeps embeddings as one contiguous float32 (or per-row
+int8-quantised) matrix on disk and memory-maps it at load, instead of parsing the
+default JSON store into Python lists. Search is a blocked matrix-vector product, or an
+optional IVF (built in numpy) or HNSW (hnswlib) index for sub-linear search.
+
+Select it at build time: python build_index.py --vector-store matrix --vector-ann ivf
+Compare backends on synthetic data: python matrix_vector_store.py --benchmark
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import build_metadata_filter_fn
+
+from index_settings import (
+    ANN_METHODS, VECTOR_BACKENDS as BACKENDS, VECTOR_DTYPES as DTYPES, vector_store_config_from_env
+)
+
+STORE_DIR = "vectors"
+FORMAT_VERSION = 1
+
+# Rows scored per matrix-vector product. int8 blocks are upcast to float32 first, so
+# they are kept small enough for the copy to stay in cache.
+BLOCK_ROWS = 65536
+INT8_BLOCK_ROWS = 4096
+
+# IVF: k-means over at most this many sampled rows per list, for a few iterations
+IVF_SAMPLE_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+
+# HNSW build and search parameters
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+def normalise(vectors):
+    """Scale rows to unit length so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def quantise(vectors):
+    """Symmetric per-row int8 quantisation: returns (int8 rows, float32 scales)"""
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+class MappedIds:
+    """Node ids stored as one UTF-8 blob plus row offsets, both memory-mapped"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+class MatrixVectorStore(BasePydanticVectorStore):
+    """Contiguous, memory-mapped embedding matrix with optional IVF/HNSW search"""
+
+    stores_text: bool = False
+    dtype: str = "float32"
+    ann: str = "none"
+    nprobe: int = 8
+
+    _matrix: Any = PrivateAttr(default=None)
+    _scales: Any = PrivateAttr(default=None)
+    _ids: Any = PrivateAttr(default=None)
+    _rows: Any = PrivateAttr(default=None)
+    _row_of: Any = PrivateAttr(default=None)
+    _ivf: Any = PrivateAttr(default=None)
+    _hnsw: Any = PrivateAttr(default=None)
+    _filter_cache: Any = PrivateAttr(default=None)
+    _path: Any = PrivateAttr(default=None)
+    _dirty: bool = PrivateAttr(default=False)
+    _lock: Any = PrivateAttr(default=None)
+
+    def __init__(self, dtype="float32", ann="none", nprobe=8, **kwargs: Any) -> None:
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}', expected one of {', '.join(DTYPES)}")
+        if ann not in ANN_METHODS:
+            raise ValueError(f"Unknown ANN method '{ann}', expected one of {', '.join(ANN_METHODS)}")
+        super().__init__(dtype=dtype, ann=ann, nprobe=nprobe, **kwargs)
+        self._ids = []
+        self._rows = []
+        self._filter_cache = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MatrixVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def size(self):
+        # Not __len__: StorageContext tests the store's truthiness, and an empty store must still count
+        return 0 if self._matrix is None else len(self._matrix)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, nprobe=None):
+        """Memory-map a store written by persist(); row metadata and HNSW load on first use"""
+        path = os.path.join(persist_dir, STORE_DIR)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format {meta.get('version')} in {path}")
+
+        store = cls(dtype=meta["dtype"], ann=meta["ann"], nprobe=nprobe or meta.get("nprobe", 8))
+        store._path = path
+        store._rows = None
+        if meta["count"]:
+            store._matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            if meta["dtype"] == "int8":
+                store._scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(path, "id_offsets.npy"), mmap_mode="r")
+            blob = np.memmap(os.path.join(path, "ids.bin"), dtype=np.uint8, mode="r") \
+                if offsets[-1] else np.zeros(0, dtype=np.uint8)
+            store._ids = MappedIds(offsets, blob)
+            if meta["ann"] == "ivf":
+                store._ivf = (np.load(os.path.join(path, "centroids.npy")),
+                              np.load(os.path.join(path, "list_offsets.npy")))
+        return store
+
+    # ----- mutation (index builds) -----
+
+    def _materialise(self):
+        """Copy a memory-mapped store into memory before it is modified"""
+        if isinstance(self._ids, list):
+            return
+        self._rows = self.rows()
+        self._ids = list(self._ids)
+        if self._matrix is not None:
+            self._matrix = np.array(self._matrix)
+            self._scales = None if self._scales is None else np.array(self._scales)
+        self._row_of = None
+
+    def _changed(self):
+        # Search structures are rebuilt by persist(); until then queries are exact
+        self._dirty = True
+        self._ivf = None
+        self._hnsw = None
+        self._row_of = None
+        self._filter_cache = {}
+
+    def _append(self, ids, vectors, rows):
+        vectors = normalise(vectors)
+        scales = None
+        if self.dtype == "int8":
+            vectors, scales = quantise(vectors)
+        with self._lock:
+            self._materialise()
+            if self._matrix is None:
+                self._matrix, self._scales = vectors, scales
+            else:
+                self._matrix = np.concatenate([self._matrix, vectors])
+                if scales is not None:
+                    self._scales = np.concatenate([self._scales, scales])
+            self._ids.extend(ids)
+            self._rows.extend(rows)
+            self._changed()
+
+    def _keep(self, keep):
+        with self._lock:
+            self._matrix = self._matrix[keep]
+            if self._scales is not None:
+                self._scales = self._scales[keep]
+            self._ids = [self._ids[row] for row in np.flatnonzero(keep)]
+            self._rows = [self._rows[row] for row in np.flatnonzero(keep)]
+            self._changed()
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        ids = [node.node_id for node in nodes]
+        self._append(ids, [node.get_embedding() for node in nodes],
+                     [{"ref_doc_id": node.ref_doc_id, "metadata": dict(node.metadata)} for node in nodes])
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        if not self.size():
+            return
+        with self._lock:
+            self._materialise()
+            self._keep(np.array([row["ref_doc_id"] != ref_doc_id for row in self._rows], dtype=bool))
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None,
+                     filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        if not self.size():
+            return
+        with self._lock:
+            self._materialise()
+            remove = set(node_ids or [])
+            matches = build_metadata_filter_fn(lambda row: self._rows[row]["metadata"], filters) \
+                if filters else (lambda row: False)
+            self._keep(np.array([self._ids[row] not in remove and not matches(row)
+                                 for row in range(len(self._ids))], dtype=bool))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix, self._scales = None, None
+            self._ids, self._rows = [], []
+            self._changed()
+
+    # ----- persistence -----
+
+    def _dequantised(self, start, end):
+        block = np.asarray(self._matrix[start:end], dtype=np.float32)
+        if self._scales is not None:
+            block *= np.asarray(self._scales[start:end])[:, None]
+        return block
+
+    def _build_ivf(self):
+        """Spherical k-means over a sample, then group rows by list so each list is contiguous"""
+        count = self.size()
+        nlist = max(1, int(round(np.sqrt(count))))
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(count, min(count, nlist * IVF_SAMPLE_PER_LIST), replace=False))
+        sample = normalise(np.asarray(self._matrix[sample_rows], dtype=np.float32))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = normalise(sums[filled])
+
+        assignment = np.concatenate([np.argmax(self._dequantised(start, start + BLOCK_ROWS) @ centroids.T, axis=1)
+                                     for start in range(0, count, BLOCK_ROWS)])
+        order = np.argsort(assignment, kind="stable")
+        self._matrix = self._matrix[order]
+        if self._scales is not None:
+            self._scales = self._scales[order]
+        self._ids = [self._ids[row] for row in order]
+        self._rows = [self._rows[row] for row in order]
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        return centroids, list_offsets
+
+    def _build_hnsw(self, path):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("VECTOR_ANN=hnsw needs hnswlib: pip install hnswlib") from e
+        index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+        index.init_index(max_elements=self.size(), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        for start in range(0, self.size(), BLOCK_ROWS):
+            block = self._dequantised(start, start + BLOCK_ROWS)
+            index.add_items(block, np.arange(start, start + len(block)))
+        index.save_index(os.path.join(path, "hnsw.bin"))
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Write the store into a vectors/ directory next to persist_path, then memory-map it"""
+        path = os.path.join(os.path.dirname(persist_path), STORE_DIR)
+        if not self._dirty and self._path == path:
+            return
+
+        with self._lock:
+            self._materialise()
+            staging = path + ".tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            ivf = self._build_ivf() if self.ann == "ivf" and self.size() else None
+            if self.size():
+                np.save(os.path.join(staging, "vectors.npy"), self._matrix)
+                if self._scales is not None:
+                    np.save(os.path.join(staging, "scales.npy"), self._scales)
+                encoded = [node_id.encode("utf-8") for node_id in self._ids]
+                np.save(os.path.join(staging, "id_offsets.npy"),
+                        np.concatenate([[0], np.cumsum([len(value) for value in encoded])]).astype(np.int64))
+                with open(os.path.join(staging, "ids.bin"), "wb") as f:
+                    f.write(b"".join(encoded))
+                if ivf is not None:
+                    np.save(os.path.join(staging, "centroids.npy"), ivf[0])
+                    np.save(os.path.join(staging, "list_offsets.npy"), ivf[1])
+                if self.ann == "hnsw":
+                    self._build_hnsw(staging)
+            with open(os.path.join(staging, "rows.jsonl"), "w", encoding="utf-8") as f:
+                for row in self._rows:
+                    f.write(json.dumps(row) + "\n")
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": FORMAT_VERSION,
+                    "count": self.size(),
+                    "dim": int(self._matrix.shape[1]) if self.size() else 0,
+                    "dtype": self.dtype,
+                    "ann": self.ann,
+                    "nprobe": self.nprobe
+                }, f)
+
+            # Swap the directory in whole so readers never see a half-written store
+            previous = path + ".old"
+            shutil.rmtree(previous, ignore_errors=True)
+            if os.path.exists(path):
+                os.replace(path, previous)
+            os.replace(staging, path)
+            shutil.rmtree(previous, ignore_errors=True)
+
+            loaded = MatrixVectorStore.from_persist_dir(os.path.dirname(path), self.nprobe)
+            self._matrix, self._scales, self._ids, self._ivf = loaded._matrix, loaded._scales, loaded._ids, loaded._ivf
+            self._rows, self._row_of, self._hnsw, self._filter_cache = None, None, None, {}
+            self._path, self._dirty = path, False
+
+    # ----- search -----
+
+    def rows(self):
+        """Per-row ref_doc_id and metadata, read on first use (filters, deletes)"""
+        with self._lock:
+            if self._rows is None:
+                with open(os.path.join(self._path, "rows.jsonl"), "r", encoding="utf-8") as f:
+                    self._rows = [json.loads(line) for line in f]
+            return self._rows
+
+    def _filter_rows(self, filters):
+        key = filters.model_dump_json() if hasattr(filters, "model_dump_json") else repr(filters)
+        rows = self._filter_cache.get(key)
+        if rows is None:
+            metadata = self.rows()
+            matches = build_metadata_filter_fn(lambda row: metadata[row]["metadata"], filters)
+            rows = np.fromiter((row for row in range(len(metadata)) if matches(row)), dtype=np.int64)
+            if len(self._filter_cache) > 256:
+                self._filter_cache.clear()
+            self._filter_cache[key] = rows
+        return rows
+
+    def _id_rows(self, node_ids):
+        with self._lock:
+            if self._row_of is None:
+                self._row_of = {node_id: row for row, node_id in enumerate(self._ids)}
+        return np.array(sorted(self._row_of[node_id] for node_id in node_ids if node_id in self._row_of), dtype=np.int64)
+
+    def _block_rows(self):
+        return INT8_BLOCK_ROWS if self._scales is not None else BLOCK_ROWS
+
+    def _score_range(self, start, end, query):
+        scores = np.asarray(self._matrix[start:end], dtype=np.float32) @ query
+        if self._scales is not None:
+            scores *= self._scales[start:end]
+        return scores
+
+    def _score_rows(self, rows, query):
+        scores = []
+        step = self._block_rows()
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            block_scores = np.asarray(self._matrix[block], dtype=np.float32) @ query
+            if self._scales is not None:
+                block_scores *= self._scales[block]
+            scores.append(block_scores)
+        return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+    def _ivf_candidates(self, query):
+        centroids, list_offsets = self._ivf
+        probes = np.argsort(centroids @ query)[::-1][:max(1, self.nprobe)]
+        return np.concatenate([np.arange(list_offsets[probe], list_offsets[probe + 1]) for probe in probes])
+
+    def _hnsw_search(self, query, top_k):
+        with self._lock:
+            if self._hnsw is None:
+                import hnswlib
+                index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+                index.load_index(os.path.join(self._path, "hnsw.bin"), max_elements=self.size())
+                self._hnsw = index
+        self._hnsw.set_ef(max(HNSW_EF_SEARCH, top_k))
+        labels, distances = self._hnsw.knn_query(query, k=min(top_k, self.size()))
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if not self.size() or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        vector = normalise(query.query_embedding)
+        top_k = query.similarity_top_k
+
+        # Filtered queries only score the matching rows, which is exact and usually small
+        rows = None
+        if query.filters is not None and query.filters.filters:
+            rows = self._filter_rows(query.filters)
+        if query.node_ids is not None:
+            id_rows = self._id_rows(query.node_ids)
+            rows = id_rows if rows is None else np.intersect1d(rows, id_rows)
+
+        if rows is None and not self._dirty and self.ann == "hnsw" and self._path:
+            rows, scores = self._hnsw_search(vector, top_k)
+        else:
+            if rows is None and not self._dirty and self._ivf is not None:
+                rows = self._ivf_candidates(vector)
+            if rows is None:
+                step = self._block_rows()
+                scores = np.concatenate([self._score_range(start, start + step, vector)
+                                         for start in range(0, self.size(), step)])
+                rows = np.arange(self.size())
+            else:
+                scores = self._score_rows(rows, vector)
+
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return VectorStoreQueryResult(
+            ids=[self._ids[int(rows[position])] for position in best],
+            similarities=[float(scores[position]) for position in best]
+        )
+
+def create_vector_store(config):
+    """A new store for a full build, or None to use llama_index's default JSON store"""
+    if config["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown vector store '{config['backend']}', expected one of {', '.join(BACKENDS)}")
+    if config["backend"] == "simple":
+        return None
+    return MatrixVectorStore(dtype=config["dtype"], ann=config["ann"], nprobe=config["nprobe"])
+
+def load_vector_store(storage_dir, config):
+    """The persisted store for config, or None when the default JSON store is used"""
+    if config["backend"] == "simple":
+        return None
+    return MatrixVectorStore.from_persist_dir(storage_dir, nprobe=config["nprobe"])
+
+def remove_unused_vectors(storage_dir, config):
+    """Delete the other backend's vectors after a full build switches backend"""
+    if config["backend"] == "matrix":
+        stale = os.path.join(storage_dir, "default__vector_store.json")
+        if os.path.exists(stale):
+            os.remove(stale)
+    else:
+        shutil.rmtree(os.path.join(storage_dir, STORE_DIR), ignore_errors=True)
+
+def stored_vector_store_config(storage_dir):
+    """Vector store settings recorded in the build manifest (query time)"""
+    config = vector_store_config_from_env()
+    try:
+        with open(os.path.join(storage_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    config["backend"] = manifest.get("vector_store", "simple")
+    config["dtype"] = manifest.get("vector_dtype", "float32")
+    config["ann"] = manifest.get("vector_ann", "none")
+    return config
+
+def benchmark(sizes, dim=384, queries=50, top_k=10):
+    """Load and search latency of each backend on clustered random vectors"""
+    rng = np.random.default_rng(0)
+    configs = [("float32", "none"), ("int8", "none"), ("float32", "ivf"), ("int8", "ivf")]
+    try:
+        import hnswlib  # noqa: F401
+        configs.append(("float32", "hnsw"))
+    except ImportError:
+        pass
+
+    results = []
+    for size in sizes:
+        # Embeddings cluster by topic; uniform noise would make every ANN look bad
+        centres = rng.standard_normal((max(1, size // 100), dim)).astype(np.float32)
+        vectors = centres[rng.integers(0, len(centres), size)] + 0.3 * rng.standard_normal((size, dim)).astype(np.float32)
+        probes = vectors[rng.integers(0, size, queries)] + 0.1 * rng.standard_normal((queries, dim)).astype(np.float32)
+        exact = normalise(vectors) @ normalise(probes).T
+        truth = [set(np.argsort(-exact[:, column])[:top_k]) for column in range(queries)]
+
+        for dtype, ann in configs:
+            directory = os.path.join("/tmp" if os.path.isdir("/tmp") else ".", f"matrix_store_benchmark_{dtype}_{ann}")
+            store = MatrixVectorStore(dtype=dtype, ann=ann)
+            store._append([str(row) for row in range(size)], vectors, [{"ref_doc_id": None, "metadata": {}}] * size)
+            started = time.perf_counter()
+            store.persist(os.path.join(directory, "default__vector_store.json"))
+            persist_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            loaded = MatrixVectorStore.from_persist_dir(directory)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            latencies, recalls = [], []
+            for column in range(queries):
+                started = time.perf_counter()
+                result = loaded.query(VectorStoreQuery(query_embedding=probes[column].tolist(), similarity_top_k=top_k))
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(truth[column] & {int(node_id) for node_id in result.ids}) / top_k)
+            latencies.sort()
+            results.append({
+                "rows": size, "dtype": dtype, "ann": ann,
+                "persist_s": round(persist_s, 3),
+                "load_ms": round(load_ms, 2),
+                "query_p50_ms": round(latencies[len(latencies) // 2], 3),
+                "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+                f"recall@{top_k}": round(sum(recalls) / len(recalls), 3),
+                "disk_mb": round(sum(path.stat().st_size for path in Path(directory, STORE_DIR).iterdir()) / 1e6, 2)
+            })
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        sizes = [int(value) for value in sys.argv[2:]] or [1000, 10000, 100000]
+        for row in benchmark(sizes):
+            print(json.dumps(row))
+        return
+    print(__doc__)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Metrics
+In-process latency histograms and counters for the query path. Recording a value is a
+bisect and a few additions under a lock, so metrics stay on in production. The query
+worker serves them at /metrics (Prometheus text format) and /metrics.json.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+PREFIX = "bajaj_assistant"
+
+# Upper bounds in milliseconds, from exact cache hits up to slow Mistral generations
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                      10000, 30000, 60000, 120000)
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are estimated from bucket upper bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts))
+        }
+
+def label_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                     for key, value in labels)
+    return "{" + pairs + "}"
+
+class Metrics:
+    """Registry of counters, gauges and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def observe_stage(self, stage, elapsed_ms, timings=None):
+        """Record a stage latency, also copying it into a per-request timings dict"""
+        self.observe("stage_latency_ms", elapsed_ms, stage=stage)
+        if timings is not None:
+            timings[f"{stage}_ms"] = round(elapsed_ms, 2)
+
+    @contextmanager
+    def span(self, stage, timings=None):
+        """Time a block as a stage, including blocks that raise"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, (time.perf_counter() - started) * 1000, timings)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def stage_summary(self):
+        """{stage: {count, mean, p50, p95}} in milliseconds"""
+        with self._lock:
+            return {
+                dict(labels)["stage"]: {key: value for key, value in histogram.snapshot().items() if key != "buckets"}
+                for (name, labels), histogram in self._histograms.items() if name == "stage_latency_ms"
+            }
+
+    def cache_hit_rates(self):
+        """Hit rate per cache from cache_lookups_total{cache, result}"""
+        totals = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                if name != "cache_lookups_total":
+                    continue
+                labels = dict(labels)
+                hits, lookups = totals.get(labels["cache"], (0, 0))
+                if labels["result"] != "miss":
+                    hits += value
+                totals[labels["cache"]] = (hits, lookups + value)
+        return {cache: round(hits / lookups, 4) if lookups else 0.0 for cache, (hits, lookups) in totals.items()}
+
+    def snapshot(self):
+        """JSON-serialisable view of every metric"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            gauges = [{"name": name, "labels": dict(labels), "value": value}
+                      for (name, labels), value in sorted(self._gauges.items())]
+            histograms = [dict(histogram.snapshot(), name=name, labels=dict(labels))
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+            "stages": self.stage_summary(),
+            "cache_hit_rates": self.cache_hit_rates()
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items())
+
+        typed = set()
+        for kind, items in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in items:
+                metric = f"{PREFIX}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    typed.add(metric)
+                lines.append(f"{metric}{label_text(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"{PREFIX}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{label_text(labels)} {round(histogram.sum, 3)}")
+            lines.append(f"{metric}_count{label_text(labels)} {histogram.count}")
+
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {round(time.time() - self.started, 1)}")
+        return "\n".join(lines) + "\n"
+
+# Shared by every module in the process
+METRICS = Metrics()
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Structured Query Engine
+Answers numeric questions (average/high/low close, returns, volatility, moving averages,
+drawdowns, quarterly metrics, peer comparisons) directly from the CSV datasets instead
+of the LLM. Tables are parsed once per process with date indexes and precomputed
+rolling statistics, so each answer is a vectorised slice computed in milliseconds.
+"""
+
+import os
+import re
+import sys
+import json
+import threading
+
+from transcript_parser import subsidiaries_in
+
+# numpy/pandas are imported with the tables, so routing a non-numeric question costs nothing
+np = None
+pd = None
+
+DATA_DIR = "./data"
+PRICE_FILES = ("BFS_Share_Price.csv", "BFS_Share_Price_Extended.csv", "BFS_Share_Price_Latest.csv")
+QUARTERLY_FILE = "bajaj_finserv_quarterly_results.csv"
+PEERS_FILE = "financial_sector_peer_comparison.csv"
+
+TRADING_DAYS = 252
+MOVING_AVERAGE_WINDOWS = (20, 50, 200)
+
+MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+MONTH_NAMES = r"(?P<name>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*"
+DAY_RES = (
+    # 15 March 2024, 15th Mar '24, 15-Mar-24
+    re.compile(rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?[\s\-]+(?:of\s+)?{MONTH_NAMES}[\s\-'’,]*(?P<year>\d{{4}}|\d{{2}})\b"),
+    # March 15, 2024
+    re.compile(rf"\b{MONTH_NAMES}\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})\b"),
+    # 2024-03-15
+    re.compile(r"\b(?P<year>20\d{2})-(?P<month>\d{2})-(?P<day>\d{2})\b")
+)
+MONTH_RE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*[\s\-'’,]*(\d{4}|\d{2})\b")
+QUARTER_RE = re.compile(r"\bq([1-4])\s*fy\s*['’]?\s*(\d{2})\b")
+FISCAL_YEAR_RE = re.compile(r"\bfy\s*['’]?\s*(\d{2}|\d{4})\b")
+YEAR_RE = re.compile(r"\b(20\d{2})\b")
+WINDOW_RE = re.compile(r"\b(\d{1,3})[\s\-]*(?:day|d)\b")
+
+# Price questions must name a price measure; "stock broking", "market share", "shareholders",
+# "close to 9%" or "closing remarks" alone are transcript questions
+PRICE_RE = re.compile(r"\b(?:share|stock)\s+prices?\b|\bclos(?:e|ing)\s+prices?\b|\bclosed\s+at\b|"
+                      r"\b(?:share|stock)s?\s+clos(?:e|ed|ing)\b|\bdrawdowns?\b|\bvolatility\b|"
+                      r"\bmoving\s+averages?\b")
+MOVING_AVERAGE_RE = re.compile(r"\bmoving\s+averages?\b")
+# Names of other Bajaj companies; the CSVs hold Bajaj Finserv's own (consolidated) figures
+OTHER_BAJAJ_RE = re.compile(r"\bbajaj\s+(?!finserv\b)[a-z]+")
+QUARTERLY_WORDS = ("by quarter", "quarterly", "each quarter", "per quarter", "every quarter",
+                   "all quarters", "quarter wise", "quarter-wise", "trend", "history", "over time")
+PEER_WORDS = ("peer", "competitor", "p/e", "pe ratio", "p/b", "pb ratio", "market cap", "dividend yield")
+COMPARE_WORDS = ("compare", "comparison", " vs ", " vs. ", "versus", "against")
+# Every route needs at least one of these (or a PRICE_RE match), so other questions skip loading the tables
+ROUTING_WORDS = QUARTERLY_WORDS + PEER_WORDS + COMPARE_WORDS
+
+QUARTERLY_METRICS = {
+    "roe": ("ROE_Percent", "ROE", "%"),
+    "return on equity": ("ROE_Percent", "ROE", "%"),
+    "revenue": ("Revenue_Crores", "Revenue", "₹ crores"),
+    "total income": ("Revenue_Crores", "Revenue", "₹ crores"),
+    "pat": ("PAT_Crores", "Profit after tax", "₹ crores"),
+    "profit after tax": ("PAT_Crores", "Profit after tax", "₹ crores"),
+    "net profit": ("PAT_Crores", "Profit after tax", "₹ crores"),
+    "profit": ("PAT_Crores", "Profit after tax", "₹ crores"),
+    "eps": ("EPS_Rs", "EPS", "₹"),
+    "earnings per share": ("EPS_Rs", "EPS", "₹"),
+    "book value": ("Book_Value_Rs", "Book value per share", "₹"),
+    "dividend": ("Dividend_Rs", "Dividend per share", "₹")
+}
+# A metric keyword next to one of these names another line item ("net interest income",
+# "operating profit", "profit before tax", "dividend yield") that the quarterly table lacks
+METRIC_QUALIFIERS_BEFORE = frozenset(("net", "interest", "operating", "gross", "premium", "fee", "other",
+                                      "underwriting", "investment", "segment", "insurance", "lending"))
+METRIC_QUALIFIERS_AFTER = frozenset(("before", "margin", "growth", "yield", "ratio", "payout", "pool"))
+
+PEER_METRICS = {
+    "p/e": ("P_E_Ratio", "P/E"),
+    "pe ratio": ("P_E_Ratio", "P/E"),
+    "p/b": ("P_B_Ratio", "P/B"),
+    "pb ratio": ("P_B_Ratio", "P/B"),
+    "market cap": ("Market_Cap_Crores", "Market cap (₹ crores)"),
+    "roe": ("ROE_Percent", "ROE %"),
+    "dividend yield": ("Dividend_Yield_Percent", "Dividend yield %"),
+    "revenue growth": ("Revenue_Growth_YoY", "Revenue growth YoY %"),
+    "profit growth": ("PAT_Growth_YoY", "PAT growth YoY %"),
+    "pat growth": ("PAT_Growth_YoY", "PAT growth YoY %")
+}
+# Metrics the peer table has no column for; a comparison of these goes to retrieval
+NON_PEER_METRIC_RE = re.compile(r"\b(?:aum|npa|revenue|profit|pat|income|premium|margin|loans?|disbursements?|"
+                                r"customers|credit\s+cost|solvency|combined\s+ratio|eps|book\s+value|dividend|"
+                                r"market\s+share)\b")
+# Subsidiaries that appear in the peer table, under its company names
+PEER_COMPANIES = {"Bajaj Finance": "bajaj finance", "BAGIC": "bajaj allianz gi"}
+
+_TABLES = None
+_TABLES_LOCK = threading.Lock()
+
+def load_price_table(data_dir):
+    """Merge the share price files into one date-indexed table with rolling statistics"""
+    frames = []
+    for name in PRICE_FILES:
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            frames.append(pd.read_csv(path, encoding="utf-8-sig"))
+    if not frames:
+        return None
+
+    prices = pd.concat(frames, ignore_index=True)
+    prices["Date"] = pd.to_datetime(prices["Date"], format="%d-%b-%y")
+    prices = (prices.rename(columns={"Close Price": "close"})
+              .drop_duplicates("Date", keep="last")
+              .set_index("Date")
+              .sort_index()[["close"]])
+
+    close = prices["close"]
+    prices["return"] = close.pct_change()
+    prices["log_return"] = np.log(close).diff()
+    for window in MOVING_AVERAGE_WINDOWS:
+        prices[f"ma_{window}"] = close.rolling(window).mean()
+    prices["volatility_20"] = prices["log_return"].rolling(20).std() * np.sqrt(TRADING_DAYS)
+    prices["running_max"] = close.cummax()
+    prices["drawdown"] = close / prices["running_max"] - 1
+    return prices
+
+def load_quarterly_table(data_dir):
+    path = os.path.join(data_dir, QUARTERLY_FILE)
+    if not os.path.exists(path):
+        return None
+    quarters = pd.read_csv(path, encoding="utf-8-sig")
+    quarters["Date"] = pd.to_datetime(quarters["Date"])
+    quarters["key"] = quarters["Quarter"].str.lower()
+    return quarters.sort_values("Date").reset_index(drop=True)
+
+def load_peer_table(data_dir):
+    path = os.path.join(data_dir, PEERS_FILE)
+    if not os.path.exists(path):
+        return None
+    peers = pd.read_csv(path, encoding="utf-8-sig")
+    peers["key"] = peers["Company"].str.lower()
+    return peers
+
+def load_dependencies():
+    global np, pd
+    if pd is None:
+        import numpy
+        import pandas
+        np, pd = numpy, pandas
+
+def get_tables(data_dir=DATA_DIR):
+    """Parse and precompute every table once per process"""
+    global _TABLES
+    with _TABLES_LOCK:
+        if _TABLES is None:
+            load_dependencies()
+            _TABLES = {
+                "prices": load_price_table(data_dir),
+                "quarters": load_quarterly_table(data_dir),
+                "peers": load_peer_table(data_dir)
+            }
+        return _TABLES
+
+def full_year(value):
+    value = int(value)
+    return value + 2000 if value < 100 else value
+
+def fiscal_quarter_range(quarter, fiscal_year):
+    """Indian fiscal quarters: Q1 FY25 is April-June 2024"""
+    start_month = 4 + 3 * (quarter - 1)
+    year = fiscal_year - 1 if start_month <= 12 else fiscal_year
+    start_month = start_month if start_month <= 12 else start_month - 12
+    start = pd.Timestamp(year=year, month=start_month, day=1)
+    return start, start + pd.offsets.QuarterEnd(startingMonth=3)
+
+def match_day(match):
+    """Timestamp for a DAY_RES match, or None if it is not a calendar date"""
+    parts = match.groupdict()
+    month = int(parts["month"]) if parts.get("month") else MONTHS[parts["name"]]
+    try:
+        return pd.Timestamp(year=full_year(parts["year"]), month=month, day=int(parts["day"]))
+    except ValueError:
+        return None
+
+def parse_period(query):
+    """Return (start, end, label) for the period named in the question, or None"""
+    days = sorted({day for day in (match_day(match) for pattern in DAY_RES for match in pattern.finditer(query))
+                   if day is not None})
+    if days:
+        label = " to ".join(dict.fromkeys(f"{day:%d %b %Y}" for day in (days[0], days[-1])))
+        return days[0], days[-1], label
+
+    months = MONTH_RE.findall(query)
+    if months:
+        bounds = []
+        for name, year in months:
+            start = pd.Timestamp(year=full_year(year), month=MONTHS[name], day=1)
+            bounds.append((start, start + pd.offsets.MonthEnd(0)))
+        label = " to ".join(dict.fromkeys(start.strftime("%B %Y") for start, _ in bounds))
+        return min(start for start, _ in bounds), max(end for _, end in bounds), label
+
+    quarter = QUARTER_RE.search(query)
+    if quarter:
+        start, end = fiscal_quarter_range(int(quarter.group(1)), full_year(quarter.group(2)))
+        return start, end, f"Q{quarter.group(1)} FY{str(full_year(quarter.group(2)))[2:]}"
+
+    fiscal_year = FISCAL_YEAR_RE.search(query)
+    if fiscal_year:
+        year = full_year(fiscal_year.group(1))
+        return pd.Timestamp(year=year - 1, month=4, day=1), pd.Timestamp(year=year, month=3, day=31), \
+            f"FY{str(year)[2:]}"
+
+    years = sorted({int(year) for year in YEAR_RE.findall(query)})
+    if years:
+        label = str(years[0]) if len(years) == 1 else f"{years[0]} to {years[-1]}"
+        return pd.Timestamp(year=years[0], month=1, day=1), pd.Timestamp(year=years[-1], month=12, day=31), label
+    return None
+
+def rupees(value):
+    return f"₹{value:,.2f}"
+
+def structured_result(query, response, data, source):
+    return {
+        "response": response,
+        "confidence": 0.95,
+        "query": query,
+        "source": f"Bajaj Finance AI Assistant (Structured data: {source})",
+        "mode": "structured",
+        "cached": False,
+        "data": data
+    }
+
+def moving_average_line(query, prices, as_of, data):
+    """The moving average the question asks for as of a date, added to data; None if it asks for none"""
+    if not (MOVING_AVERAGE_RE.search(query) or re.search(r"\bma\b|\bdma\b", query)):
+        return None
+    requested = WINDOW_RE.search(query)
+    size = int(requested.group(1)) if requested else 50
+    column = f"ma_{size}"
+    # Precomputed windows are a column lookup; other sizes are rolled over the full history
+    series = prices[column] if column in prices else prices["close"].rolling(size).mean()
+    value = series.loc[:as_of].iloc[-1]
+    if pd.isna(value):
+        return None
+    data[f"moving_average_{size}d"] = round(float(value), 2)
+    return f"{size}-day moving average of {rupees(value)} as of {as_of:%d %b %Y}"
+
+def answer_price_day(query, prices, window):
+    """A question about one trading day gets that day's close, not statistics for its month"""
+    day = window.index[0]
+    close = float(window["close"].iloc[0])
+    data = {"period": f"{day:%d %b %Y}", "from": f"{day:%Y-%m-%d}", "to": f"{day:%Y-%m-%d}",
+            "trading_days": 1, "close": round(close, 2)}
+    lines = [f"closed at {rupees(close)} on {day:%d %b %Y}"]
+    previous = prices.loc[:day].iloc[:-1]
+    if not previous.empty:
+        change = close / float(previous["close"].iloc[-1]) - 1
+        data["day_change_percent"] = round(change * 100, 2)
+        lines.append(f"a change of {data['day_change_percent']:+.2f}% on the previous close")
+    moving_average = moving_average_line(query, prices, day, data)
+    if moving_average:
+        lines.append(f"a {moving_average}")
+    return structured_result(query, "Bajaj Finserv share price " + "; ".join(lines) + ".", data, "share prices")
+
+def answer_price_query(query, prices):
+    period = parse_period(query)
+    if period:
+        start, end, label = period
+        window = prices.loc[start:end]
+    else:
+        window, label = prices, "the full history"
+    if window.empty:
+        return structured_result(query, f"No Bajaj Finserv share price data is available for {label}. "
+                                 f"Data covers {prices.index[0]:%d %b %Y} to {prices.index[-1]:%d %b %Y}.",
+                                 {"period": label, "trading_days": 0}, "share prices")
+
+    if period and start == end:
+        return answer_price_day(query, prices, window)
+
+    close = window["close"]
+    data = {"period": label, "from": f"{window.index[0]:%Y-%m-%d}", "to": f"{window.index[-1]:%Y-%m-%d}",
+            "trading_days": int(close.size)}
+    lines = []
+
+    if "drawdown" in query:
+        # Drawdown within the period, measured from the highest close seen so far in that period
+        drawdown = window["drawdown"] if period is None else close / close.cummax() - 1
+        trough = drawdown.idxmin()
+        peak = close.loc[:trough].idxmax()
+        data.update(max_drawdown_percent=round(float(drawdown.min()) * 100, 2),
+                    peak_date=f"{peak:%Y-%m-%d}", trough_date=f"{trough:%Y-%m-%d}")
+        lines.append(f"maximum drawdown of {abs(data['max_drawdown_percent']):.2f}% from "
+                     f"{rupees(close[peak])} on {peak:%d %b %Y} to {rupees(close[trough])} on {trough:%d %b %Y}")
+
+    if "volatil" in query:
+        returns = window["log_return"].dropna()
+        volatility = float(returns.std() * np.sqrt(TRADING_DAYS)) if returns.size > 1 else 0.0
+        data["annualised_volatility_percent"] = round(volatility * 100, 2)
+        lines.append(f"annualised volatility of {data['annualised_volatility_percent']:.2f}%")
+
+    moving_average = moving_average_line(query, prices, window.index[-1], data)
+    if moving_average:
+        lines.append(moving_average)
+
+    if any(word in query for word in ("return", "change", "perform", "gain", "growth")):
+        change = float(close.iloc[-1] / close.iloc[0] - 1)
+        data["return_percent"] = round(change * 100, 2)
+        lines.append(f"a return of {data['return_percent']:+.2f}% "
+                     f"({rupees(close.iloc[0])} to {rupees(close.iloc[-1])})")
+
+    # "50 day moving average" is not a request for the average close
+    wants_average = re.search(r"\b(average|mean|avg)\b", MOVING_AVERAGE_RE.sub(" ", query)) is not None
+    wants_high = re.search(r"\b(highest|high|max|maximum|peak|top)\b", query) is not None
+    wants_low = re.search(r"\b(lowest|low|min|minimum|bottom)\b", query) is not None
+    if not lines and not (wants_average or wants_high or wants_low):
+        wants_average = wants_high = wants_low = True
+
+    if wants_average:
+        data["average_close"] = round(float(close.mean()), 2)
+        lines.append(f"an average close of {rupees(data['average_close'])}")
+    if wants_high and "drawdown" not in query:
+        high_date = close.idxmax()
+        data.update(highest_close=round(float(close.max()), 2), highest_date=f"{high_date:%Y-%m-%d}")
+        lines.append(f"a highest close of {rupees(close.max())} on {high_date:%d %b %Y}")
+    if wants_low and "drawdown" not in query:
+        low_date = close.idxmin()
+        data.update(lowest_close=round(float(close.min()), 2), lowest_date=f"{low_date:%Y-%m-%d}")
+        lines.append(f"a lowest close of {rupees(close.min())} on {low_date:%d %b %Y}")
+
+    response = (f"Bajaj Finserv share price for {label} ({data['trading_days']} trading days, "
+                f"{window.index[0]:%d %b %Y} to {window.index[-1]:%d %b %Y}): " + "; ".join(lines) + ".")
+    return structured_result(query, response, data, "share prices")
+
+def quarterly_metrics(query):
+    """
+    Quarterly table columns named in the question, or None if a metric phrase is qualified
+    into a line item the table does not have ("net interest income", "operating profit")
+    """
+    covered = []
+    for keyword in sorted(QUARTERLY_METRICS, key=len, reverse=True):
+        for match in re.finditer(rf"\b{re.escape(keyword)}\b", query):
+            start, end = match.span()
+            if any(start >= left and end <= right for left, right, _ in covered):
+                continue
+            before = re.findall(r"[a-z]+", query[:start])[-1:]
+            after = re.findall(r"[a-z]+", query[end:])[:1]
+            if METRIC_QUALIFIERS_BEFORE.intersection(before) or METRIC_QUALIFIERS_AFTER.intersection(after):
+                return None
+            covered.append((start, end, QUARTERLY_METRICS[keyword]))
+    # In the order the question names them
+    metrics = list(dict.fromkeys(metric for _, _, metric in sorted(covered)))
+    return metrics or None
+
+def answer_quarterly_query(query, quarters):
+    metrics = quarterly_metrics(query)
+    if not metrics:
+        return None
+
+    period = parse_period(query)
+    if period:
+        start, end, label = period
+        rows = quarters[(quarters["Date"] >= start) & (quarters["Date"] <= end)]
+    else:
+        rows, label = quarters.tail(8), "the last 8 quarters"
+    if rows.empty:
+        return None
+
+    data = {"period": label, "quarters": rows["Quarter"].tolist()}
+    lines = []
+    for column, name, unit in metrics:
+        values = rows[column].astype(float)
+        data[column] = [round(value, 2) for value in values]
+        series = ", ".join(f"{quarter}: {value:,.2f}" for quarter, value in zip(rows["Quarter"], values))
+        summary = f"average {values.mean():,.2f}, high {values.max():,.2f} ({rows['Quarter'].iloc[int(values.argmax())]})"
+        lines.append(f"{name} ({unit}) by quarter for {label} - {series} ({summary})")
+
+    return structured_result(query, "Bajaj Finserv " + ". ".join(lines) + ".", data, "quarterly results")
+
+def named_companies(query, peers):
+    """
+    Peer table keys of the companies a question names, or None if it names a Bajaj
+    company the table does not list (industry names such as "general insurance" are not companies)
+    """
+    industries = re.compile("|".join(re.escape(industry) for industry in peers["Industry"].str.lower().unique()))
+    without_industries = subsidiaries_in(industries.sub(" ", query))
+    named = [company for company in peers["key"] if company in query]
+    for subsidiary in subsidiaries_in(query):
+        if subsidiary in PEER_COMPANIES:
+            named.append(PEER_COMPANIES[subsidiary])
+        elif subsidiary in without_industries:
+            return None
+    # "Bajaj Housing Finance" contains no table key, but is still a company the table lacks
+    if any(not any(key.startswith(name) for key in peers["key"]) for name in OTHER_BAJAJ_RE.findall(query)):
+        return None
+    return list(dict.fromkeys(named))
+
+def answer_peer_query(query, peers):
+    """Peer table comparison, or None if it cannot answer the metric or a named company"""
+    companies = named_companies(query, peers)
+    if companies is None:
+        return None
+    metrics, remaining = [], query
+    for keyword, metric in PEER_METRICS.items():
+        if keyword in query:
+            remaining = remaining.replace(keyword, " ")
+            if metric not in metrics:
+                metrics.append(metric)
+    # "Bajaj Finance vs Bajaj Housing AUM" asks for a metric only the transcripts have
+    if NON_PEER_METRIC_RE.search(remaining):
+        return None
+    if not metrics:
+        metrics = [PEER_METRICS["p/e"], PEER_METRICS["roe"], PEER_METRICS["market cap"]]
+
+    named = peers[peers["key"].isin(companies)]
+    if len(named) > 1:
+        rows, scope = named, "selected companies"
+    else:
+        # Compare Bajaj Finserv with its own industry by default
+        own_industry = peers.loc[peers["key"] == "bajaj finserv", "Industry"]
+        industry = named["Industry"].iloc[0] if len(named) == 1 else \
+            (own_industry.iloc[0] if len(own_industry) else peers["Industry"].iloc[0])
+        rows, scope = peers[peers["Industry"] == industry], f"{industry} peers"
+
+    data = {"companies": rows["Company"].tolist()}
+    lines = []
+    for column, name in metrics:
+        ranked = rows.sort_values(column, ascending=False)
+        data[column] = dict(zip(ranked["Company"], ranked[column].astype(float).round(2)))
+        lines.append(f"{name}: " + ", ".join(f"{company} {value:,.2f}"
+                                             for company, value in data[column].items()))
+    return structured_result(query, f"Comparison of {scope} - " + "; ".join(lines) + ".", data, "peer comparison")
+
+def answer_structured_query(query, data_dir=DATA_DIR):
+    """Answer from the CSV tables if the question is a numeric one they cover, else None"""
+    text = f" {query.lower()} "
+    price_question = PRICE_RE.search(text) is not None
+    if not price_question and not any(word in text for word in ROUTING_WORDS):
+        return None
+    tables = get_tables(data_dir)
+    result = None
+
+    peers = tables["peers"]
+    other_company = False
+    if peers is not None:
+        other_company = any(company in text for company in peers["key"] if company != "bajaj finserv")
+        if any(word in text for word in PEER_WORDS) or \
+                (other_company and any(word in text for word in COMPARE_WORDS)):
+            result = answer_peer_query(text, peers)
+
+    # The quarterly results and share prices are Bajaj Finserv's own; questions about a
+    # subsidiary or another company go to retrieval instead
+    if result is None and (other_company or subsidiaries_in(text) or OTHER_BAJAJ_RE.search(text)):
+        return None
+
+    if result is None and tables["quarters"] is not None and any(word in text for word in QUARTERLY_WORDS):
+        result = answer_quarterly_query(text, tables["quarters"])
+
+    if result is None and tables["prices"] is not None and price_question:
+        result = answer_price_query(text, tables["prices"])
+
+    if result is not None:
+        result["query"] = query
+    return result
+
+def main():
+    query = " ".join(sys.argv[1:])
+    print(json.dumps(answer_structured_query(query), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
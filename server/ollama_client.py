@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Ollama Client
+One pooled, keep-alive HTTP client to the local Ollama server shared by every query in
+the process. Requests wait in a bounded queue for a free slot, and generation is streamed
+so a per-request deadline can stop it and keep whatever text was produced.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+
+from metrics import METRICS
+
+def llm_config_from_env():
+    """Ollama client settings from OLLAMA_* and LLM_* environment variables"""
+    return {
+        "base_url": os.environ.get("OLLAMA_URL", "http://localhost:11434"),
+        "model": os.environ.get("OLLAMA_MODEL", "mistral"),
+        # Ollama generates one answer at a time by default; more slots only queue there instead
+        "max_concurrency": int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "1")),
+        "connect_timeout": float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "2")),
+        "request_timeout": float(os.environ.get("LLM_REQUEST_TIMEOUT", "60")),
+        "keep_alive": os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+        "num_ctx": int(os.environ.get("LLM_NUM_CTX", "4096")),
+        "max_tokens": int(os.environ.get("LLM_MAX_TOKENS", "384")),
+        "temperature": float(os.environ.get("LLM_TEMPERATURE", "0.75"))
+    }
+
+# Where a request was when its deadline passed
+DEADLINE_STAGES = {
+    "queue": "queued for the model",
+    "first_token": "waiting for the first token",
+    "generation": "generating"
+}
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed while queued or generating; partial holds any text produced"""
+
+    def __init__(self, stage, partial=""):
+        super().__init__(f"deadline exceeded while {DEADLINE_STAGES[stage]}")
+        self.stage = stage
+        self.partial = partial
+
+class Deadline:
+    """A point in time a request must finish by; seconds=None or 0 means no deadline"""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+class OllamaClient:
+    """Streams completions from Ollama over pooled connections, at most max_concurrency at a time"""
+
+    def __init__(self, base_url, model="mistral", max_concurrency=1, connect_timeout=2.0,
+                 request_timeout=60.0, keep_alive="30m", num_ctx=4096, max_tokens=384, temperature=0.75):
+        import httpx
+        self._httpx = httpx
+        self.model = model
+        self.keep_alive = keep_alive
+        self.options = {"num_ctx": num_ctx, "num_predict": max_tokens, "temperature": temperature}
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.client = httpx.Client(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            timeout=httpx.Timeout(request_timeout, connect=connect_timeout)
+        )
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+
+    def _update(self, waiting=0, in_flight=0):
+        with self.lock:
+            self.waiting += waiting
+            self.in_flight += in_flight
+            METRICS.set_gauge("llm_queue_depth", self.waiting)
+            METRICS.set_gauge("llm_in_flight", self.in_flight)
+
+    def _timeout(self, deadline):
+        # A read may wait at most until the deadline; tokens arrive every few ms once generation starts
+        remaining = deadline.remaining() if deadline is not None else None
+        read = self.request_timeout if remaining is None else min(self.request_timeout, max(remaining, 0.001))
+        return self._httpx.Timeout(read, connect=self.connect_timeout)
+
+    def _watchdog(self, response, deadline):
+        """
+        Shut the response's connection down when the deadline passes. The read timeout is fixed
+        when the request starts, so a stall mid-answer would otherwise outlast the deadline
+        """
+        remaining = deadline.remaining() if deadline is not None else None
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None and remaining is not None else None
+        if sock is None:
+            return None
+
+        def expire():
+            try:
+                # Wakes the blocked read with end-of-stream; closing alone would not
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        timer = threading.Timer(remaining, expire)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def stream(self, prompt, deadline=None, timings=None):
+        """Yield answer tokens; raises DeadlineExceeded (with the partial text) if the deadline passes"""
+        queued = time.perf_counter()
+        self._update(waiting=1)
+        try:
+            remaining = deadline.remaining() if deadline is not None else None
+            acquired = self.slots.acquire(timeout=remaining) if remaining is not None else self.slots.acquire()
+        finally:
+            self._update(waiting=-1)
+        METRICS.observe_stage("llm_queue", (time.perf_counter() - queued) * 1000, timings)
+        if not acquired:
+            METRICS.inc("llm_requests_total", outcome="queue_deadline")
+            raise DeadlineExceeded("queue")
+
+        produced = []
+        outcome = "error"
+        self._update(in_flight=1)
+        started = time.perf_counter()
+        try:
+            payload = {"model": self.model, "prompt": prompt, "stream": True,
+                       "options": self.options, "keep_alive": self.keep_alive}
+            with self.client.stream("POST", "/api/generate", json=payload, timeout=self._timeout(deadline)) as response:
+                watchdog = self._watchdog(response, deadline)
+                try:
+                    response.raise_for_status()
+                    finished = False
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(f"Ollama error: {chunk['error']}")
+                        token = chunk.get("response", "")
+                        if token:
+                            if not produced:
+                                METRICS.observe_stage("llm_first_token", (time.perf_counter() - started) * 1000, timings)
+                            produced.append(token)
+                            yield token
+                        finished = bool(chunk.get("done"))
+                        # The "done" chunk is the last line; reading to the end returns the connection to the pool
+                        if not finished and deadline is not None and deadline.expired():
+                            # Leaving the block closes the connection, which stops Ollama generating
+                            outcome = "deadline"
+                            raise DeadlineExceeded("generation", "".join(produced))
+                    if not finished and deadline is not None and deadline.expired():
+                        # The watchdog ended the stream
+                        outcome = "deadline"
+                        raise DeadlineExceeded("generation" if produced else "first_token", "".join(produced))
+                finally:
+                    if watchdog is not None:
+                        watchdog.cancel()
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "abandoned"  # Client went away mid-stream
+            raise
+        except self._httpx.TransportError as e:
+            # A read timeout, or the watchdog shutting the connection down mid-read
+            if deadline is None or not deadline.expired():
+                raise
+            outcome = "deadline"
+            raise DeadlineExceeded("generation" if produced else "first_token", "".join(produced)) from e
+        finally:
+            self._update(in_flight=-1)
+            self.slots.release()
+            METRICS.inc("llm_requests_total", outcome=outcome)
+
+    def complete(self, prompt, deadline=None, timings=None):
+        return "".join(self.stream(prompt, deadline, timings))
+
+    def close(self):
+        self.client.close()
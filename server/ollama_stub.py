@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Ollama Stub Server
+A local stand-in for Ollama's HTTP API (/api/tags, /api/show, /api/chat, /api/generate)
+so the AI path can be benchmarked and tested without a model or network. Answers are
+extractive: the context sentences that share the most words with the question, streamed
+word by word with a configurable delay. --parallel limits how many answers are generated
+at once, like OLLAMA_NUM_PARALLEL, so queueing and deadlines can be exercised.
+
+Run it with: python ollama_stub.py --port 11435 --first-token-ms 200 --token-ms 20
+then point the assistant at it: OLLAMA_URL=http://127.0.0.1:11435
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTEXT_RE = re.compile(r"-{5,}\n(.*?)\n-{5,}", re.DOTALL)
+QUERY_RE = re.compile(r"(?:Query|Question):\s*(.*?)\s*Answer:\s*$", re.DOTALL)
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+HEADER_RE = re.compile(r"^\[[^\]\n]*\]\s*", re.MULTILINE)
+WORD_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how in is it its of on or "
+    "said say the their this to was were what when which who why with".split()
+)
+ANSWER_SENTENCES = 3
+CONTEXT_LENGTH = 8192
+
+def stub_answer(prompt):
+    """The context sentences that best overlap the question, in their original order"""
+    context = CONTEXT_RE.search(prompt)
+    query = QUERY_RE.search(prompt)
+    if not context:
+        return "The provided context does not contain this information."
+    question = query.group(1) if query else prompt
+    terms = {word for word in WORD_RE.findall(question.lower()) if word not in STOPWORDS}
+
+    # Excerpt headers such as "[Q2 FY25 | S. Sreenivasan]" are labels, not answer text
+    sentences = [sentence.strip() for sentence in SENTENCE_RE.split(HEADER_RE.sub("", context.group(1)))
+                 if sentence.strip()]
+    scored = [(len(terms & set(WORD_RE.findall(sentence.lower()))), position)
+              for position, sentence in enumerate(sentences)]
+    best = sorted(position for score, position in sorted(scored, reverse=True)[:ANSWER_SENTENCES] if score)
+    if not best:
+        return "The provided context does not contain this information."
+    return " ".join(sentences[position] for position in best)
+
+class StubState:
+    """Latency settings and request counters shared by every handler thread"""
+
+    def __init__(self, first_token_ms=0.0, token_ms=0.0, parallel=0, stall_after=0, stall_ms=0.0):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        # Pause for stall_ms after stall_after tokens, like a model stuck mid-answer
+        self.stall_after = stall_after
+        self.stall_ms = stall_ms
+        self.slots = threading.Semaphore(parallel) if parallel else None
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles the subset of the Ollama API used by llama_index's Ollama client"""
+
+    server_version = "OllamaStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def setup(self):
+        # Once per TCP connection; a pooled client sends many requests over one
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode("utf-8")) if length > 0 else {}
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.send_json(200, {"models": [{"name": "mistral:latest", "model": "mistral:latest"}]})
+        elif self.path == "/stats":
+            state = self.state
+            self.send_json(200, {"connections": state.connections, "requests": state.requests,
+                                 "in_flight": state.in_flight,
+                                 "max_in_flight": state.max_in_flight})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/api/show":
+            self.read_json()
+            self.send_json(200, {"model_info": {"llama.context_length": CONTEXT_LENGTH},
+                                 "details": {"family": "stub"}})
+            return
+        if self.path not in ("/api/chat", "/api/generate"):
+            self.send_json(404, {"error": "not found"})
+            return
+
+        payload = self.read_json()
+        chat = self.path == "/api/chat"
+        if chat:
+            messages = payload.get("messages") or [{}]
+            prompt = messages[-1].get("content", "")
+        else:
+            prompt = payload.get("prompt", "")
+
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            if state.slots is not None:
+                state.slots.acquire()
+            try:
+                self.respond(payload, chat, prompt)
+            finally:
+                if state.slots is not None:
+                    state.slots.release()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up, e.g. on a deadline
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def respond(self, payload, chat, prompt):
+        state = self.state
+        words = stub_answer(prompt).split(" ")
+        limit = (payload.get("options") or {}).get("num_predict")
+        if limit and limit > 0:
+            words = words[:limit]
+        time.sleep(state.first_token_ms / 1000)
+
+        def chunk(text, done):
+            body = {"model": payload.get("model", "mistral"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "done": done}
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            if done:
+                body.update(done_reason="stop", prompt_eval_count=len(prompt.split()), eval_count=len(words))
+            return body
+
+        if not payload.get("stream", True):
+            time.sleep(state.token_ms * len(words) / 1000)
+            self.send_json(200, chunk(" ".join(words), True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for position, word in enumerate(words):
+            if position:
+                time.sleep(state.token_ms / 1000)
+            if state.stall_after and position == state.stall_after:
+                time.sleep(state.stall_ms / 1000)
+            self.write_chunk(chunk(word if position == 0 else " " + word, False))
+        self.write_chunk(chunk("", True))
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def write_chunk(self, body):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def start_stub(host="127.0.0.1", port=0, first_token_ms=0.0, token_ms=0.0, parallel=0, stall_after=0, stall_ms=0.0):
+    """Serve the stub on a background thread; returns (server, base URL)"""
+    httpd = ThreadingHTTPServer((host, port), StubHandler)
+    httpd.daemon_threads = True
+    httpd.state = StubState(first_token_ms, token_ms, parallel, stall_after, stall_ms)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://{host}:{httpd.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Bajaj Finserv AI Assistant - Ollama Stub Server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-ms", type=float, default=0.0, help="Delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Delay between streamed tokens")
+    parser.add_argument("--parallel", type=int, default=0,
+                        help="Answers generated at once; others wait (0 = unlimited)")
+    parser.add_argument("--stall-after", type=int, default=0, help="Tokens streamed before a stall (0 = none)")
+    parser.add_argument("--stall-ms", type=float, default=0.0, help="Length of the stall")
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    httpd.daemon_threads = True
+    httpd.state = StubState(args.first_token_ms, args.token_ms, args.parallel, args.stall_after, args.stall_ms)
+    print(f"🧪 Ollama stub listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    main()
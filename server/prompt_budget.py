@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Prompt Budget
+Assembles the Mistral prompt from retrieved passages within a token budget. Passages go
+in most relevant first, whole while they fit; one that does not fit is cut at a sentence
+boundary to the budget left, or dropped when too little is left. Prompt size, and with
+it CPU prefill time, stays bounded however many passages retrieval returns.
+"""
+
+import os
+import re
+
+PROMPT_TEMPLATE = (
+    "Answer the question about Bajaj Finserv's FY25 earnings calls using only the excerpts below. "
+    "Quote figures exactly and say which quarter they are from. If the excerpts do not contain "
+    "the answer, say so.\n"
+    "---------------------\n"
+    "{context}\n"
+    "---------------------\n"
+    "Question: {question}\n"
+    "Answer: "
+)
+
+# A trimmed passage shorter than this is dropped rather than included
+MIN_EXCERPT_TOKENS = 48
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+def prompt_config_from_env():
+    """Prompt settings from PROMPT_* environment variables"""
+    return {"context_tokens": int(os.environ.get("PROMPT_CONTEXT_TOKENS", "1500"))}
+
+def token_counter():
+    """Count tokens with llama_index's tokenizer (an approximation of Mistral's)"""
+    from llama_index.core.utils import get_tokenizer
+    tokenizer = get_tokenizer()
+    return lambda text: len(tokenizer(text))
+
+def excerpt_header(metadata):
+    """'[Q2 FY25 | S. Sreenivasan]' from a node's quarter and speakers tags"""
+    parts = [metadata.get("quarter") or metadata.get("file_name")]
+    if metadata.get("speakers"):
+        parts.append(metadata["speakers"])
+    return "[" + " | ".join(part for part in parts if part) + "]"
+
+def trim_to_budget(text, budget, count):
+    """The leading sentences of text that fit in budget tokens"""
+    kept = []
+    used = 0
+    for sentence in SENTENCE_RE.split(text):
+        tokens = count(sentence + " ")
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+def build_prompt(question, nodes, context_tokens, count=None):
+    """
+    Return (prompt, stats) for retrieved nodes (NodeWithScore, most relevant first). stats
+    has context_tokens, passages (used), passages_trimmed and passages_dropped.
+    """
+    count = count or token_counter()
+    remaining = context_tokens
+    excerpts = []
+    trimmed = dropped = 0
+
+    for node in nodes:
+        header = excerpt_header(node.node.metadata)
+        text = " ".join(node.node.get_content().split())
+        cost = count(f"{header} {text}\n\n")
+        if cost <= remaining:
+            excerpts.append(f"{header} {text}")
+            remaining -= cost
+            continue
+
+        partial = trim_to_budget(text, remaining - count(header + " \n\n"), count) if remaining >= MIN_EXCERPT_TOKENS else ""
+        if partial and count(partial) >= MIN_EXCERPT_TOKENS:
+            excerpts.append(f"{header} {partial}")
+            remaining = max(0, remaining - count(f"{header} {partial}\n\n"))
+            trimmed += 1
+        else:
+            dropped += 1
+
+    prompt = PROMPT_TEMPLATE.format(context="\n\n".join(excerpts), question=question.strip())
+    return prompt, {
+        "context_tokens": context_tokens - remaining,
+        "passages": len(excerpts),
+        "passages_trimmed": trimmed,
+        "passages_dropped": dropped
+    }
@@ -1,93 +1,226 @@
 #!/usr/bin/env python3
 """
 Bajaj Finserv AI Assistant - Query Engine
-This script processes user queries using the pre-built vector index or fallback system
+This script processes user queries using the pre-built vector index or fallback system.
+llama_index, torch and pandas are imported only once a query needs them, after a cheap
+pre-check (libraries installed, index built, Ollama reachable) has chosen the mode.
+AI answers have a deadline (QUERY_DEADLINE_SECONDS): past it, the best answer at hand is
+returned instead - a similar cached answer, the text generated so far, or the lexical
+fallback.
 """
 
 import sys
 import os
 import json
+import time
+import argparse
+import importlib.util
 from pathlib import Path
 
-# Try to import AI libraries, fallback to basic system if not available
-try:
-    from llama_index.core import StorageContext, load_index_from_storage, Settings
-    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-    from llama_index.llms.ollama import Ollama
-    AI_AVAILABLE = True
-except ImportError:
-    AI_AVAILABLE = False
+from metrics import METRICS
+from response_cache import response_cache_from_env, storage_version
+from lexical_index import search_transcripts
+from transcript_parser import question_filters
+
+# Packages AI mode imports; their presence is checked without importing them
+AI_PACKAGES = ("llama_index.core", "llama_index.embeddings.huggingface", "httpx")
+
+def module_installed(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+AI_AVAILABLE = all(module_installed(name) for name in AI_PACKAGES)
+
+# Numeric questions over the CSV datasets are answered without the LLM when pandas is available
+STRUCTURED_AVAILABLE = module_installed("pandas") and module_installed("numpy")
+
+# Passages quoted by the lexical fallback
+FALLBACK_TOP_K = 3
+
+STORAGE_DIR = "./storage"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_CHECK_TIMEOUT = float(os.environ.get("OLLAMA_CHECK_TIMEOUT", "0.5"))
+
+# "auto" runs the pre-check; "fallback" never loads AI libraries; "ai" skips the pre-check
+QUERY_MODE = os.environ.get("QUERY_MODE", "auto")
+
+# Seconds an AI answer may take end to end (0 disables); see degraded_result. Kept below
+# the Node layer's QUERY_TIMEOUT_MS (30s) so the degraded answer arrives before it gives up
+QUERY_DEADLINE_SECONDS = float(os.environ.get("QUERY_DEADLINE_SECONDS", "20"))
+# Node's timeout starts when it spawns the CLI, so a CLI query's deadline counts from here
+PROCESS_STARTED = time.perf_counter()
+# Looser than RESPONSE_CACHE_SIMILARITY: a close cached answer beats no AI answer
+DEGRADED_CACHE_SIMILARITY = float(os.environ.get("DEGRADED_CACHE_SIMILARITY", "0.85"))
+# Generated text shorter than this is not worth returning as a partial answer
+PARTIAL_MIN_CHARS = 120
+
+# Pooled Ollama client shared by every query; created by setup_models
+LLM_CLIENT = None
+
+# Why the last runtime load left the assistant in fallback mode: (reason, detail)
+RUNTIME_FALLBACK = (None, None)
+
+def log_failure(stage, error):
+    """Count a failure and report it on stderr; stdout is reserved for the JSON answer"""
+    METRICS.inc("errors_total", stage=stage)
+    print(f"[{stage}] {type(error).__name__}: {error}", file=sys.stderr)
+
+def set_runtime_fallback(reason, detail=None):
+    global RUNTIME_FALLBACK
+    RUNTIME_FALLBACK = (reason, detail)
+
+def ollama_reachable(timeout=OLLAMA_CHECK_TIMEOUT):
+    """True if the Ollama server answers its model list endpoint"""
+    import urllib.request
+    try:
+        with urllib.request.urlopen(f"{OLLAMA_URL}/api/tags", timeout=timeout) as response:
+            return response.status == 200
+    except (OSError, ValueError):
+        return False
+
+def ai_precheck(check_ollama=True):
+    """Decide the mode before anything heavy is imported: (True, None, None) or (False, reason, detail)"""
+    with METRICS.span("precheck"):
+        if QUERY_MODE == "fallback":
+            return False, "fallback_forced", "QUERY_MODE=fallback"
+        if QUERY_MODE == "ai":
+            return True, None, None
+        if not AI_AVAILABLE:
+            missing = [name for name in AI_PACKAGES if not module_installed(name)]
+            return False, "ai_libraries_missing", f"Not installed: {', '.join(missing)}"
+        if not os.path.exists(os.path.join(STORAGE_DIR, "docstore.json")):
+            return False, "index_missing", f"{STORAGE_DIR} not found; run build_index.py"
+        if check_ollama and not ollama_reachable():
+            return False, "ollama_unreachable", f"No response from {OLLAMA_URL}; run 'ollama serve'"
+        return True, None, None
 
 def setup_models():
-    """Configure LLM and embedding models"""
-    if not AI_AVAILABLE:
+    """Configure the Ollama client and embedding model"""
+    global LLM_CLIENT
+    try:
+        with METRICS.span("import_ai"):
+            from llama_index.core import Settings
+            from embedding_pipeline import create_embed_model
+            from index_settings import embedding_config_from_env
+            from ollama_client import OllamaClient, llm_config_from_env
+    except ImportError as e:
+        set_runtime_fallback("ai_libraries_missing", str(e))
         return False
         
     try:
-        # Configure Ollama LLM
-        llm = Ollama(model="mistral", request_timeout=60.0)
-        
-        # Configure HuggingFace embeddings
-        embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        with METRICS.span("setup_models"):
+            # One pooled client per process; connections stay open between queries
+            if LLM_CLIENT is None:
+                LLM_CLIENT = OllamaClient(**dict(llm_config_from_env(), base_url=OLLAMA_URL))
+            
+            # Configure HuggingFace embeddings, sharing the on-disk cache with build_index.py
+            # A worker pool only pays off for index builds; queries embed one text at a time
+            embed_model = create_embed_model(**dict(embedding_config_from_env(), processes=None))
         
-        # Set global settings
-        Settings.llm = llm
+        # Generation goes through LLM_CLIENT; llama_index only needs the embedding model
         Settings.embed_model = embed_model
         
         return True
-    except Exception:
+    except Exception as e:
+        log_failure("setup_models", e)
+        set_runtime_fallback("model_setup_failed", f"{type(e).__name__}: {e}")
         return False
 
 def load_index():
     """Load the pre-built vector index"""
-    if not AI_AVAILABLE:
-        return None
-        
     try:
-        storage_dir = "./storage"
+        from llama_index.core import StorageContext, load_index_from_storage
+        from matrix_vector_store import load_vector_store, stored_vector_store_config
+        
+        storage_dir = STORAGE_DIR
         
         if not os.path.exists(storage_dir):
+            set_runtime_fallback("index_missing", f"{storage_dir} not found; run build_index.py")
             return None
             
         # Load index from storage
-        storage_context = StorageContext.from_defaults(persist_dir=storage_dir)
-        index = load_index_from_storage(storage_context)
+        with METRICS.span("load_index"):
+            # The manifest records which vector store the index was built with
+            vector_store = load_vector_store(storage_dir, stored_vector_store_config(storage_dir))
+            storage_context = StorageContext.from_defaults(persist_dir=storage_dir, vector_store=vector_store)
+            index = load_index_from_storage(storage_context)
         
         return index
         
-    except Exception:
+    except Exception as e:
+        log_failure("load_index", e)
+        set_runtime_fallback("index_load_failed", f"{type(e).__name__}: {e}")
         return None
 
-def query_index(index, query_text):
-    """Query the index and return response"""
+def describe_source(node_with_score):
+    """Summarise a retrieved node for streaming clients"""
+    node = node_with_score.node
+    return {
+        "file_name": node.metadata.get("file_name"),
+        "score": round(node_with_score.score, 4) if node_with_score.score is not None else None,
+        "text": node.get_content()[:300]
+    }
+
+def prepare_prompt(index, query_text, timings):
+    """Retrieve passages with the hybrid retriever and fit them into the prompt's token budget"""
+    from llama_index.core.schema import QueryBundle
+    from hybrid_retrieval import HybridRetriever, retrieval_config_from_env
+    from prompt_budget import build_prompt, prompt_config_from_env
+    
+    retriever = HybridRetriever(index, **retrieval_config_from_env())
+    nodes = retriever.retrieve(QueryBundle(query_text))
+    timings.update(retriever.timings)
+    with METRICS.span("prompt", timings):
+        prompt, prompt_stats = build_prompt(query_text, nodes, prompt_config_from_env()["context_tokens"])
+    return nodes, prompt, prompt_stats
+
+def query_index(index, query_text, timings=None, deadline=None):
+    """
+    Answer from the index, returning (response, prompt stats) and recording per-stage latency
+    in timings if given. Raises DeadlineExceeded, carrying any partial text, past the deadline.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    _, prompt, prompt_stats = prepare_prompt(index, query_text, timings)
+    
+    # Failures propagate so the caller can fall back with a reason
     try:
-        # Create query engine with custom settings
-        query_engine = index.as_query_engine(
-            response_mode="compact",
-            similarity_top_k=3,
-            streaming=False
-        )
-        
-        # Add context to the query for better financial responses
-        enhanced_query = f"""
-        Based on Bajaj Finance's earnings call transcripts (Q1-Q4 FY25), please answer the following question:
-        
-        {query_text}
-        
-        Please provide specific data points, financial metrics, and management commentary where relevant.
-        If the information is not available in the transcripts, please state that clearly.
-        """
-        
-        # Execute query
-        response = query_engine.query(enhanced_query)
-        
-        return str(response)
-        
-    except Exception as e:
-        return f"Query processing error: {e}"
+        with METRICS.span("synthesis", timings):
+            response = LLM_CLIENT.complete(prompt, deadline, timings)
+    finally:
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return response, prompt_stats
+
+def stream_query_index(index, query_text, deadline=None):
+    """Query the index, yielding the retrieved sources first and then tokens as Mistral produces them"""
+    timings = {}
+    nodes, prompt, prompt_stats = prepare_prompt(index, query_text, timings)
+    yield {
+        "type": "sources",
+        "sources": [describe_source(node) for node in nodes],
+        "timings": timings,
+        "prompt": prompt_stats
+    }
+    
+    for token in LLM_CLIENT.stream(prompt, deadline):
+        yield {"type": "token", "token": token}
+
+def format_passage(passage):
+    """Attribute a retrieved passage to its call and speaker"""
+    origin = f"the {passage['quarter']} earnings call" if passage.get("quarter") else passage["source"]
+    speaker = f", {passage['speaker']}" if passage.get("speaker") else ""
+    return f"From {origin}{speaker}: \"{passage['text']}\""
 
-def generate_fallback_response(query):
+def generate_fallback_response(query, passages=None):
     """Generate fallback responses based on real transcript content"""
+    # Quote the best-matching transcript passages (BM25) when the lexical index is available
+    if passages is None:
+        passages = search_transcripts(query, FALLBACK_TOP_K, question_filters(query))
+    if passages:
+        return "\n\n".join(format_passage(passage) for passage in passages)
+    
     query_lower = query.lower()
     
     # Real data from Bajaj Finserv FY25 earnings transcripts
@@ -142,53 +275,321 @@ def calculate_confidence(response_text, has_ai=False):
     except:
         return 0.5
 
+def embed_query(query_text):
+    """Embed the query for near-duplicate cache lookups (reused by retrieval via the embedding cache)"""
+    from llama_index.core import Settings
+    try:
+        with METRICS.span("embed_query"):
+            return Settings.embed_model.get_query_embedding(query_text)
+    except Exception as e:
+        log_failure("embed_query", e)
+        return None
+
+def lookup_cache(query_text, cache):
+    """Return (cached result or None, query embedding computed for the lookup)"""
+    hit = cache.get_exact(query_text)
+    query_embedding = None
+    if hit is None:
+        query_embedding = embed_query(query_text)
+        hit = cache.get_similar(query_text, query_embedding)
+    if hit is None:
+        cache.record_miss()
+        METRICS.inc("cache_lookups_total", cache="response", result="miss")
+        return None, query_embedding
+    
+    result, tier, similarity = hit
+    METRICS.inc("cache_lookups_total", cache="response", result=tier)
+    return dict(result, query=query_text, cached=True,
+                cache_tier=tier, cache_similarity=round(similarity, 4)), query_embedding
+
+def ai_result(query_text, response, prompt_stats=None):
+    return {
+        "response": response,
+        "confidence": calculate_confidence(response, has_ai=True),
+        "query": query_text,
+        "source": "Bajaj Finance AI Assistant (Advanced)",
+        "mode": "ai",
+        "fallback_reason": None,
+        "prompt": prompt_stats
+    }
+
+def fallback_result(query_text, reason=None, detail=None):
+    """Transcript-based answer, tagged with why the AI path was not used"""
+    if reason is None:
+        reason, detail = RUNTIME_FALLBACK
+    
+    # Fallback to transcript-based responses
+    with METRICS.span("lexical_search"):
+        passages = search_transcripts(query_text, FALLBACK_TOP_K, question_filters(query_text))
+    response = generate_fallback_response(query_text, passages)
+    confidence = calculate_confidence(response, has_ai=False)
+    
+    return {
+        "response": response,
+        "confidence": confidence,
+        "query": query_text,
+        "source": "Bajaj Finance AI Assistant (Transcript-based)",
+        "mode": "fallback",
+        "cached": False,
+        "fallback_reason": reason or "ai_not_loaded",
+        "fallback_detail": detail,
+        "sources": passages
+    }
+
+def deadline_detail(deadline, error):
+    return f"{round(deadline.seconds, 1):g}s {error}"
+
+def degraded_result(query_text, error, deadline, cache=None, query_embedding=None):
+    """
+    Best answer once the deadline has passed: a cached answer to a similar question, else
+    the text generated so far, else the lexical fallback
+    """
+    detail = deadline_detail(deadline, error)
+    METRICS.inc("deadline_exceeded_total", stage=error.stage)
+    
+    if cache is not None and query_embedding is not None:
+        hit = cache.get_similar(query_text, query_embedding, DEGRADED_CACHE_SIMILARITY)
+        if hit is not None:
+            result, _, similarity = hit
+            METRICS.inc("degraded_answers_total", source="cache")
+            return dict(result, query=query_text, cached=True, cache_tier="degraded",
+                        cache_similarity=round(similarity, 4), fallback_detail=detail)
+    
+    if len(error.partial.strip()) >= PARTIAL_MIN_CHARS:
+        METRICS.inc("degraded_answers_total", source="partial")
+        return dict(ai_result(query_text, error.partial.rstrip() + " ..."), cached=False, partial=True,
+                    fallback_detail=detail)
+    
+    METRICS.inc("degraded_answers_total", source="lexical")
+    return fallback_result(query_text, "deadline_exceeded", detail)
+
+def structured_answer(query_text):
+    """Answer from the CSV tables, or None if the question is not a structured one"""
+    if not STRUCTURED_AVAILABLE:
+        return None
+    try:
+        with METRICS.span("structured"):
+            # pandas is only imported once a question mentions prices, quarters or peers
+            from numeric_query import answer_structured_query
+            return answer_structured_query(query_text)
+    except Exception as e:
+        log_failure("structured", e)
+        return None
+
+def record_result(result, started):
+    """Count the answer by mode and fallback reason and record its end-to-end latency"""
+    METRICS.inc("queries_total", mode=result["mode"])
+    if result["mode"] == "fallback":
+        METRICS.inc("fallback_total", reason=result["fallback_reason"])
+    METRICS.observe("request_latency_ms", (time.perf_counter() - started) * 1000, mode=result["mode"])
+
+def answer_query(query_text, index=None, cache=None, deadline_seconds=None):
+    """
+    Answer a single query and return the JSON-serialisable result. deadline_seconds
+    overrides QUERY_DEADLINE_SECONDS; 0 answers without a deadline.
+    """
+    started = time.perf_counter()
+    result = compute_answer(query_text, index, cache, deadline_seconds)
+    record_result(result, started)
+    return result
+
+def compute_answer(query_text, index=None, cache=None, deadline_seconds=None):
+    # Numbers held in the CSV datasets are computed directly
+    structured = structured_answer(query_text)
+    if structured is not None:
+        return structured
+    
+    # Try AI system first
+    if index is not None:
+        from ollama_client import Deadline, DeadlineExceeded
+        deadline = Deadline(QUERY_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+        query_embedding = None
+        if cache is not None:
+            cached, query_embedding = lookup_cache(query_text, cache)
+            if cached is not None:
+                return cached
+        
+        timings = {}
+        try:
+            result = ai_result(query_text, *query_index(index, query_text, timings, deadline))
+            if cache is not None:
+                cache.put(query_text, result, query_embedding)
+            return dict(result, cached=False, timings=timings)
+        except DeadlineExceeded as e:
+            return dict(degraded_result(query_text, e, deadline, cache, query_embedding), timings=timings)
+        except Exception as e:
+            log_failure("query", e)
+            return fallback_result(query_text, "query_failed", f"{type(e).__name__}: {e}")
+    
+    return fallback_result(query_text)
+
+def stream_answer(query_text, index=None, cache=None, deadline_seconds=None):
+    """
+    Answer a query as a sequence of events: "sources", then "token" events, then "done"
+    carrying the same fields as answer_query plus time-to-first-token and total latency.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    sources_sent = False
+    failure = (None, None)
+    result = structured_answer(query_text)
+    
+    if result is None and index is not None:
+        from ollama_client import Deadline, DeadlineExceeded
+        deadline = Deadline(QUERY_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+        query_embedding = None
+        if cache is not None:
+            result, query_embedding = lookup_cache(query_text, cache)
+        
+        if result is None:
+            tokens = []
+            prompt_stats = None
+            try:
+                for event in stream_query_index(index, query_text, deadline):
+                    if event["type"] == "sources":
+                        sources_sent = True
+                        prompt_stats = event["prompt"]
+                    elif first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    if event["type"] == "token":
+                        tokens.append(event["token"])
+                    yield event
+                result = ai_result(query_text, "".join(tokens), prompt_stats)
+                if cache is not None:
+                    cache.put(query_text, result, query_embedding)
+                result = dict(result, cached=False)
+            except DeadlineExceeded as e:
+                # Streamed tokens cannot be recalled, so they end the answer; otherwise degrade
+                if tokens:
+                    METRICS.inc("deadline_exceeded_total", stage=e.stage)
+                    result = dict(ai_result(query_text, "".join(tokens), prompt_stats), cached=False,
+                                  partial=True, fallback_detail=deadline_detail(deadline, e))
+                else:
+                    result = degraded_result(query_text, e, deadline, cache, query_embedding)
+            except Exception as e:
+                log_failure("stream", e)
+                failure = ("stream_failed", f"{type(e).__name__}: {e}")
+                # Tokens already sent cannot be recalled; fall back only if nothing was streamed
+                if tokens:
+                    result = dict(ai_result(query_text, "".join(tokens)), cached=False, partial=True,
+                                  fallback_detail=failure[1])
+    
+    if result is None:
+        result = fallback_result(query_text, *failure)
+    
+    # Structured, cached and fallback answers arrive whole, as a single token
+    if first_token_at is None:
+        if not sources_sent:
+            yield {"type": "sources", "sources": result.get("sources", [])}
+        first_token_at = time.perf_counter()
+        yield {"type": "token", "token": result["response"]}
+    
+    finished = time.perf_counter()
+    record_result(result, started)
+    METRICS.observe("ttft_ms", (first_token_at - started) * 1000, mode=result["mode"])
+    yield dict(result, type="done",
+               ttft_ms=round((first_token_at - started) * 1000, 1),
+               total_ms=round((finished - started) * 1000, 1))
+
+def load_runtime(check_ollama=True):
+    """Set up models and load the index, returning None when AI mode is unavailable"""
+    available, reason, detail = ai_precheck(check_ollama)
+    if not available:
+        set_runtime_fallback(reason, detail)
+        return None
+    if setup_models():
+        index = load_index()
+        if index is not None:
+            set_runtime_fallback(None)
+        return index
+    return None
+
+def parse_args(argv):
+    """Parse command line arguments, treating anything that is not a known flag as the query"""
+    parser = argparse.ArgumentParser(description="Bajaj Finserv AI Assistant - Query Engine")
+    parser.add_argument("query", nargs="*", help="Question to answer")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print newline-delimited JSON events (sources, tokens, done) as they are produced")
+    parser.add_argument("--batch", metavar="QUERIES_JSONL",
+                        help="Answer every query in a JSONL file and write JSONL results in order")
+    parser.add_argument("--output", metavar="RESULTS_JSONL",
+                        help="Where --batch writes results (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("BATCH_CONCURRENCY", "4")),
+                        help="Queries answered in parallel by --batch")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Print per-stage latency and counters as JSON on stderr when done")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived HTTP worker instead of answering a single query")
+    parser.add_argument("--host", default=os.environ.get("QUERY_WORKER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("QUERY_WORKER_PORT", "8765")))
+    parser.add_argument("--max-concurrency", type=int,
+                        default=int(os.environ.get("QUERY_WORKER_CONCURRENCY", "2")),
+                        help="Maximum number of queries answered at the same time")
+    parser.add_argument("--queue-timeout", type=float,
+                        default=float(os.environ.get("QUERY_WORKER_QUEUE_TIMEOUT", "30")),
+                        help="Seconds a request may wait for a free slot before being rejected")
+    
+    # Only run argparse when a flag is given so free-form questions such as
+    # "-5% drop?" keep working on the CLI path
+    if not argv or not argv[0].startswith("--"):
+        return parser.parse_args([]), " ".join(argv)
+    args = parser.parse_args(argv)
+    return args, " ".join(args.query)
+
 def main():
     """Main function to process query"""
     try:
+        args, query_text = parse_args(sys.argv[1:])
+        
+        if args.batch:
+            from batch_query import run_batch
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as output:
+                    summary = run_batch(args.batch, output, args.concurrency)
+            else:
+                summary = run_batch(args.batch, sys.stdout, args.concurrency)
+            # Keep stdout pure JSONL; the aggregate report goes to stderr
+            print(json.dumps(summary), file=sys.stderr)
+            return
+        
+        if args.serve:
+            from query_server import serve
+            serve(args.host, args.port, args.max_concurrency, args.queue_timeout)
+            return
+        
         # Get query from command line argument
-        if len(sys.argv) < 2:
+        if not query_text:
             print(json.dumps({
                 "error": "No query provided",
                 "message": "Please provide a query as a command line argument"
             }))
             sys.exit(1)
-            
-        query_text = " ".join(sys.argv[1:])
-        
-        # Try AI system first
-        if AI_AVAILABLE and setup_models():
-            index = load_index()
-            if index is not None:
-                try:
-                    response = query_index(index, query_text)
-                    confidence = calculate_confidence(response, has_ai=True)
-                    
-                    result = {
-                        "response": response,
-                        "confidence": confidence,
-                        "query": query_text,
-                        "source": "Bajaj Finance AI Assistant (Advanced)",
-                        "mode": "ai"
-                    }
-                    
-                    print(json.dumps(result))
-                    return
-                except Exception:
-                    pass  # Fall through to fallback
-        
-        # Fallback to transcript-based responses
-        response = generate_fallback_response(query_text)
-        confidence = calculate_confidence(response, has_ai=False)
-        
-        result = {
-            "response": response,
-            "confidence": confidence,
-            "query": query_text,
-            "source": "Bajaj Finance AI Assistant (Transcript-based)",
-            "mode": "fallback"
-        }
-        
-        print(json.dumps(result))
+        
+        index = load_runtime()
+        cache = None
+        if index is not None:
+            cache = response_cache_from_env()
+            if cache is not None:
+                cache.set_index_version(storage_version(STORAGE_DIR))
+        
+        deadline_seconds = None
+        if QUERY_DEADLINE_SECONDS:
+            # Whatever is left after loading; a tiny budget still returns the best answer at hand
+            deadline_seconds = max(0.1, QUERY_DEADLINE_SECONDS - (time.perf_counter() - PROCESS_STARTED))
+        
+        if args.stream:
+            for event in stream_answer(query_text, index, cache, deadline_seconds):
+                print(json.dumps(event), flush=True)
+            result = event
+        else:
+            result = answer_query(query_text, index, cache, deadline_seconds)
+            print(json.dumps(result))
+        
+        if cache is not None and result["mode"] == "ai" and not result["cached"]:
+            cache.save()
+        
+        if args.metrics:
+            print(json.dumps(METRICS.snapshot()), file=sys.stderr)
         
     except Exception as e:
         print(json.dumps({
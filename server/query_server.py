@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Query Worker
+Long-lived HTTP server that loads the models and index once and answers many queries.
+Start it with: python query_llm.py --serve --port 8765
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import query_llm
+from metrics import METRICS
+from response_cache import response_cache_from_env, storage_version
+
+class WorkerState:
+    """Models and index shared by every request handled by the worker"""
+
+    def __init__(self, max_concurrency, queue_timeout):
+        self.index = None
+        self.cache = None
+        self.ready = False
+        self.error = None
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def mode(self):
+        return "ai" if self.index is not None else "fallback"
+
+    def load(self):
+        """Load models and index; the worker answers in fallback mode until this finishes"""
+        try:
+            # Ollama may start after the worker, so only libraries and index decide the mode
+            self.index = query_llm.load_runtime(check_ollama=False)
+            if self.index is not None:
+                # Kept in memory only; the worker is the process that sees repeat queries
+                self.cache = response_cache_from_env(persistent=False)
+                if self.cache is not None:
+                    self.cache.set_index_version(storage_version(query_llm.STORAGE_DIR))
+        except Exception as e:
+            self.error = str(e)
+        self.ready = True
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Handles /health, /ready, /metrics, /query and /query/stream"""
+
+    server_version = "BajajQueryWorker/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # Keep stdout clean; the Node layer only reads response bodies
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_text(self, status, text, content_type="text/plain; version=0.0.4"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def update_gauges(self):
+        """Refresh point-in-time worker state before metrics are rendered"""
+        state = self.state
+        METRICS.set_gauge("worker_ready", int(state.ready))
+        METRICS.set_gauge("worker_ai_mode", int(state.mode == "ai"))
+        METRICS.set_gauge("worker_in_flight", state.in_flight)
+        METRICS.set_gauge("worker_max_concurrency", state.max_concurrency)
+        if state.cache is not None:
+            METRICS.set_gauge("response_cache_entries", len(state.cache))
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return {}
+        payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        if not isinstance(payload, dict):
+            raise ValueError("Body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/ready":
+            state = self.state
+            self.send_json(200 if state.ready else 503, {
+                "ready": state.ready,
+                "mode": state.mode,
+                "error": state.error,
+                "fallback_reason": query_llm.RUNTIME_FALLBACK[0],
+                "in_flight": state.in_flight,
+                "cache": state.cache.stats() if state.cache is not None else None,
+                "max_concurrency": state.max_concurrency
+            })
+        elif self.path == "/metrics":
+            self.update_gauges()
+            self.send_text(200, METRICS.render_prometheus())
+        elif self.path == "/metrics.json":
+            self.update_gauges()
+            self.send_json(200, METRICS.snapshot())
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def send_events(self, events):
+        """
+        Write newline-delimited JSON events as they are produced; the connection closes at the
+        end. Once the 200 headers are out a failure can only be reported in-stream, as an
+        {"type": "error"} event.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for event in events:
+                self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            self.wfile.write((json.dumps({
+                "type": "error",
+                "error": f"Unexpected error: {e}",
+                "message": "An unexpected error occurred while processing the query"
+            }) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+    def do_POST(self):
+        if self.path not in ("/query", "/query/stream"):
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            payload = self.read_json()
+        except ValueError:
+            self.send_json(400, {"error": "Invalid request", "message": "Body must be a JSON object"})
+            return
+
+        query_text = payload.get("query") or payload.get("message")
+        if not query_text or not isinstance(query_text, str):
+            self.send_json(400, {
+                "error": "No query provided",
+                "message": "Request body must contain a 'query' string"
+            })
+            return
+
+        state = self.state
+        if not state.slots.acquire(timeout=state.queue_timeout):
+            METRICS.inc("worker_rejected_total")
+            self.send_json(503, {
+                "error": "Worker busy",
+                "message": "Too many concurrent queries, please retry"
+            })
+            return
+
+        try:
+            with state.lock:
+                state.in_flight += 1
+            if self.path == "/query/stream":
+                self.send_events(query_llm.stream_answer(query_text, state.index, state.cache))
+            else:
+                result = query_llm.answer_query(query_text, state.index, state.cache)
+                self.send_json(200, result)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away mid-stream
+        except Exception as e:
+            self.send_json(500, {
+                "error": f"Unexpected error: {e}",
+                "message": "An unexpected error occurred while processing the query"
+            })
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+            state.slots.release()
+
+def serve(host="127.0.0.1", port=8765, max_concurrency=2, queue_timeout=30.0):
+    """Run the query worker until interrupted"""
+    state = WorkerState(max_concurrency, queue_timeout)
+    httpd = ThreadingHTTPServer((host, port), QueryHandler)
+    httpd.daemon_threads = True
+    httpd.state = state
+
+    # Load models in the background so /health answers immediately and /ready
+    # reports when the index is usable
+    threading.Thread(target=state.load, daemon=True).start()
+
+    print(f"🚀 Query worker listening on http://{host}:{port}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Response Cache
+Two-tier cache in front of query_index: exact hits on the normalised query, then
+near-duplicate hits by query-embedding similarity among entries asking about the same
+quarter, year, subsidiary and numbers. Entries are evicted by LRU/TTL and dropped
+whenever the index in ./storage changes.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from transcript_parser import question_filters
+
+DEFAULT_CACHE_PATH = "./cache/responses.json"
+
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+def normalise_query(query):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s%₹]", " ", query.lower()).split())
+
+def query_scope(query):
+    """
+    What a question is about beyond its wording: the quarter, year and subsidiary filters
+    plus any numbers. "ROE in Q2" and "ROE in Q3" embed almost identically but differ here.
+    """
+    filters = {key: sorted(values) for key, values in question_filters(query).items()}
+    return {"filters": filters, "numbers": sorted(set(NUMBER_RE.findall(normalise_query(query))))}
+
+def storage_version(storage_dir="./storage"):
+    """Fingerprint of the persisted index; changes whenever the index is rebuilt"""
+    manifest = os.path.join(storage_dir, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+
+    # Indexes built before the manifest existed: fall back to file sizes and mtimes
+    if not os.path.isdir(storage_dir):
+        return None
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(storage_dir)):
+        stat = os.stat(os.path.join(storage_dir, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = sum(x * x for x in a) ** 0.5
+    norm_b = sum(y * y for y in b) ** 0.5
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+class ResponseCache:
+    """Bounded LRU cache of query results with TTL and index-version invalidation"""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600.0, similarity_threshold=0.92, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.path = path
+        self.index_version = None
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_index_version(self, version):
+        """Drop every entry if the index has changed since they were cached"""
+        with self._lock:
+            if version != self.index_version:
+                self._entries.clear()
+                self.index_version = version
+
+    def _expired(self, entry, now):
+        return self.ttl_seconds and now - entry["created"] > self.ttl_seconds
+
+    def _evict(self, now):
+        for key in [key for key, entry in self._entries.items() if self._expired(entry, now)]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_exact(self, query):
+        """Return (result, "exact", 1.0) on a hit for the normalised query, else None"""
+        key = normalise_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry, now):
+                return None
+            self._entries.move_to_end(key)
+            self.hits["exact"] += 1
+            return entry["result"], "exact", 1.0
+
+    def get_similar(self, query, embedding, threshold=None):
+        """
+        Return (result, "semantic", similarity) for the closest cached query above the
+        threshold that has the same query_scope
+        """
+        if embedding is None:
+            return None
+        scope = query_scope(query)
+        now = time.time()
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold if threshold is None else threshold
+            for key, entry in self._entries.items():
+                if entry["embedding"] is None or self._expired(entry, now):
+                    continue
+                # Entries saved before scopes were recorded never match semantically
+                if entry.get("scope") != scope:
+                    continue
+                score = cosine_similarity(embedding, entry["embedding"])
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits["semantic"] += 1
+            return self._entries[best_key]["result"], "semantic", best_score
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query, result, embedding=None):
+        """Cache a result under the normalised query"""
+        now = time.time()
+        with self._lock:
+            key = normalise_query(query)
+            self._entries[key] = {
+                "result": result,
+                "embedding": list(embedding) if embedding is not None else None,
+                "scope": query_scope(query),
+                "created": now
+            }
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.misses + sum(self.hits.values())
+            return {
+                "entries": len(self._entries),
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round(sum(self.hits.values()) / lookups, 4) if lookups else 0.0
+            }
+
+    def load(self):
+        """Load entries persisted by a previous process"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self.index_version = data.get("index_version")
+            self._entries = OrderedDict(data.get("entries", []))
+            self._evict(time.time())
+
+    def save(self):
+        """
+        Persist entries so short-lived CLI processes share the cache. Concurrent processes
+        each write their own temporary file, and the last replace wins. A failed save
+        only loses cache entries, so it is logged rather than raised.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            data = {"index_version": self.index_version, "entries": list(self._entries.items())}
+        tmp_path = None
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=".responses-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Response cache not saved: {type(e).__name__}: {e}", file=sys.stderr)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def response_cache_from_env(persistent=True):
+    """Create the response cache from RESPONSE_CACHE_* environment variables, or None if disabled"""
+    path = os.environ.get("RESPONSE_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if path == "off":
+        return None
+    return ResponseCache(
+        max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL", "3600")),
+        similarity_threshold=float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.92")),
+        path=path if persistent else None
+    )
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Startup Benchmark
+Measures cold starts of query_llm.py in each mode: wall-clock time to the first answer
+plus a `python -X importtime` breakdown of what the process imported on the way.
+
+Run it with: python startup_benchmark.py --runs 3 --output startup.json
+Fail when a cold start regresses: python startup_benchmark.py --budget fallback=500
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+# name -> (environment overrides, arguments after query_llm.py, or None for the HTTP worker)
+SCENARIOS = {
+    "fallback": ({"QUERY_MODE": "fallback"}, ["What did management say about housing NPA?"]),
+    "structured": ({"QUERY_MODE": "fallback"}, ["What was the average closing price in 2023?"]),
+    "ai": ({"QUERY_MODE": "auto"}, ["What did management say about housing NPA?"]),
+    "worker": ({"QUERY_MODE": "auto"}, None)
+}
+
+def parse_importtime(stderr):
+    """Return (total import ms, [(module, cumulative ms)] for top-level imports)"""
+    total_us = 0
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # column header
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total_us += self_us
+        if not name.startswith("  "):
+            top_level.append((name.strip(), round(cumulative_us / 1000, 1)))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return round(total_us / 1000, 1), top_level
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_cli(env, args):
+    """Time query_llm.py from spawn until its JSON answer is printed"""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", "query_llm.py"] + args,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, text=True)
+    line = process.stdout.readline()
+    first_answer_ms = (time.perf_counter() - started) * 1000
+    _, stderr = process.communicate()
+    wall_ms = (time.perf_counter() - started) * 1000
+    result = json.loads(line) if line.strip() else {}
+    return first_answer_ms, wall_ms, stderr, result
+
+def run_worker(env, timeout=300.0):
+    """Time the worker from spawn until it has answered its first /query"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", "query_llm.py", "--serve", "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env, text=True)
+    url = f"http://127.0.0.1:{port}"
+    result = {}
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"{url}/ready", timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except OSError:
+                time.sleep(0.02)
+        request = urllib.request.Request(f"{url}/query", method="POST",
+                                         data=json.dumps({"query": SCENARIOS["ai"][1][0]}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            result = json.loads(response.read().decode("utf-8"))
+        first_answer_ms = (time.perf_counter() - started) * 1000
+    finally:
+        process.terminate()
+        _, stderr = process.communicate()
+    return first_answer_ms, first_answer_ms, stderr, result
+
+def benchmark(name, runs=3, top=10):
+    overrides, args = SCENARIOS[name]
+    env = dict(os.environ, **overrides)
+    samples = []
+    for _ in range(runs):
+        first_answer_ms, wall_ms, stderr, result = run_worker(env) if args is None else run_cli(env, args)
+        import_ms, imports = parse_importtime(stderr)
+        samples.append((first_answer_ms, wall_ms, import_ms, imports, result))
+
+    first_answer, wall, import_total = (statistics.median(sample[i] for sample in samples) for i in range(3))
+    _, _, _, imports, result = samples[-1]
+    return {
+        "first_answer_ms": round(first_answer, 1),
+        "wall_ms": round(wall, 1),
+        "import_ms": round(import_total, 1),
+        "runs": runs,
+        "answered_mode": result.get("mode"),
+        "fallback_reason": result.get("fallback_reason"),
+        "top_imports": [{"module": module, "cumulative_ms": ms} for module, ms in imports[:top]]
+    }
+
+def parse_budgets(values):
+    budgets = {}
+    for value in values or []:
+        name, _, limit = value.partition("=")
+        if name not in SCENARIOS or not limit:
+            raise SystemExit(f"Invalid budget '{value}', expected one of {', '.join(SCENARIOS)}=<ms>")
+        budgets[name] = float(limit)
+    return budgets
+
+def main():
+    parser = argparse.ArgumentParser(description="Bajaj Finserv AI Assistant - Startup Benchmark")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per scenario; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--budget", nargs="*", metavar="SCENARIO=MS",
+                        help="Exit non-zero if a scenario's median time to first answer exceeds MS")
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    report = {"python": sys.version.split()[0], "scenarios": {}}
+    for name in args.scenarios:
+        report["scenarios"][name] = benchmark(name, args.runs, args.top)
+        print(f"⏱️  {name}: first answer {report['scenarios'][name]['first_answer_ms']} ms, "
+              f"imports {report['scenarios'][name]['import_ms']} ms", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    over = [name for name, limit in budgets.items()
+            if name in report["scenarios"] and report["scenarios"][name]["first_answer_ms"] > limit]
+    if over:
+        for name in over:
+            print(f"❌ {name} cold start {report['scenarios'][name]['first_answer_ms']} ms "
+                  f"exceeds budget {budgets[name]} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Ollama Client Checks
+Exercises the pooled client, its queue and the per-request deadline against the local
+Ollama stub, so no model server is needed. Exits non-zero if any check fails.
+
+Run it with: python test_ollama_client.py
+"""
+
+import sys
+import time
+import threading
+
+import httpx
+
+from metrics import METRICS
+from ollama_client import Deadline, DeadlineExceeded, OllamaClient
+from ollama_stub import start_stub
+from prompt_budget import PROMPT_TEMPLATE
+
+CONTEXT = (
+    "[Q2 FY25 | S. Sreenivasan] Bajaj Housing Finance AUM grew 26% to Rs 1,02,569 crores. "
+    "Net total income grew 18% and profit after tax was Rs 546 crores, up 21%. "
+    "Gross NPA was 29 basis points and net NPA was 12 basis points. "
+    "Housing finance remains a low-risk, low-margin business with ROE of 13.03%."
+)
+PROMPT = PROMPT_TEMPLATE.format(context=CONTEXT, question="How did Bajaj Housing Finance AUM and NPA do?")
+
+def stub_client(first_token_ms=0.0, token_ms=0.0, stall_after=0, stall_ms=0.0):
+    """A one-slot stub and a one-slot client, like a default Ollama install"""
+    httpd, url = start_stub(first_token_ms=first_token_ms, token_ms=token_ms, parallel=1,
+                            stall_after=stall_after, stall_ms=stall_ms)
+    return httpd, OllamaClient(base_url=url, max_concurrency=1)
+
+def stub_stats(httpd):
+    host, port = httpd.server_address
+    return httpx.get(f"http://{host}:{port}/stats").json()
+
+def check_connection_reuse():
+    httpd, client = stub_client()
+    try:
+        answers = [client.complete(PROMPT) for _ in range(3)]
+        stats = stub_stats(httpd)
+        assert all("26%" in answer for answer in answers), answers
+        assert stats["requests"] == 3, stats
+        # One connection for the three generations (the /stats request opens its own)
+        assert stats["connections"] == 2, stats
+    finally:
+        client.close()
+        httpd.shutdown()
+
+def check_queue_deadline():
+    httpd, client = stub_client(first_token_ms=800)
+    try:
+        # The first request holds the only slot; the second gives up in the queue
+        holder = threading.Thread(target=client.complete, args=(PROMPT,))
+        holder.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        try:
+            client.complete(PROMPT, Deadline(0.3))
+            raise AssertionError("expected DeadlineExceeded")
+        except DeadlineExceeded as e:
+            elapsed = time.perf_counter() - started
+            assert e.stage == "queue" and e.partial == "", (e.stage, e.partial)
+            assert elapsed < 0.6, elapsed
+        holder.join()
+        assert stub_stats(httpd)["max_in_flight"] == 1
+    finally:
+        client.close()
+        httpd.shutdown()
+
+def check_first_token_deadline():
+    httpd, client = stub_client(first_token_ms=800)
+    try:
+        client.complete(PROMPT, Deadline(0.3))
+        raise AssertionError("expected DeadlineExceeded")
+    except DeadlineExceeded as e:
+        assert e.stage == "first_token" and e.partial == "", (e.stage, e.partial)
+    finally:
+        client.close()
+        httpd.shutdown()
+
+def check_mid_stream_stall():
+    # Five tokens stream over 0.3s, then the model stalls for 3s; the read that is waiting
+    # when the 0.6s deadline passes must not run on to the read timeout set at the start
+    httpd, client = stub_client(token_ms=60, stall_after=5, stall_ms=3000)
+    try:
+        started = time.perf_counter()
+        try:
+            client.complete(PROMPT, Deadline(0.6))
+            raise AssertionError("expected DeadlineExceeded")
+        except DeadlineExceeded as e:
+            elapsed = time.perf_counter() - started
+            assert e.stage == "generation" and len(e.partial.split()) == 5, (e.stage, e.partial)
+            assert elapsed < 0.8, elapsed
+    finally:
+        client.close()
+        httpd.shutdown()
+
+def check_partial_answer():
+    import query_llm
+
+    # About 25 words arrive before the deadline; the whole answer takes twice as long
+    httpd, client = stub_client(token_ms=40)
+    try:
+        deadline = Deadline(1.0)
+        try:
+            client.complete(PROMPT, deadline)
+            raise AssertionError("expected DeadlineExceeded")
+        except DeadlineExceeded as e:
+            assert e.stage == "generation" and e.partial.startswith("Bajaj Housing Finance"), (e.stage, e.partial)
+            error = e
+        # Enough text comes back as a partial answer, too little as the lexical fallback
+        result = query_llm.degraded_result("How did Bajaj Housing Finance AUM do?", error, deadline)
+        assert result["mode"] == "ai" and result.get("partial") and result["response"].endswith(" ..."), \
+            (result["mode"], result["response"][:80])
+        short = DeadlineExceeded("generation", "Bajaj Housing")
+        result = query_llm.degraded_result("How did Bajaj Housing Finance AUM do?", short, deadline)
+        assert result["mode"] == "fallback" and result["fallback_reason"] == "deadline_exceeded", \
+            (result["mode"], result.get("fallback_reason"))
+    finally:
+        client.close()
+        httpd.shutdown()
+
+CHECKS = [check_connection_reuse, check_queue_deadline, check_first_token_deadline, check_mid_stream_stall,
+          check_partial_answer]
+
+def main():
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {check.__name__}: {type(e).__name__}: {e}")
+    outcomes = {entry["labels"]["outcome"]: entry["value"]
+                for entry in METRICS.snapshot()["counters"] if entry["name"] == "llm_requests_total"}
+    print(f"📊 llm_requests_total: {outcomes}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
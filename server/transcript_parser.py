@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Bajaj Finserv AI Assistant - Transcript Parser
+Splits earnings call transcripts into speaker turns, marks where the Q&A session starts
+and which analyst question each turn belongs to, and tags every turn with quarter,
+fiscal year, speaker and the subsidiaries it concerns. The same tags are read out of a
+user's question so retrieval can be narrowed to the call or business it names.
+
+Inspect a transcript with: python transcript_parser.py transcripts/Q2_FY25_Earnings_Call.txt
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+
+QUARTER_RE = re.compile(r"(?<![A-Za-z0-9])Q([1-4])[\s_]*FY[\s_'‘’]*(\d{2})(?![0-9])", re.IGNORECASE)
+BARE_QUARTER_RE = re.compile(r"(?<![A-Za-z0-9])Q([1-4])(?![A-Za-z0-9])", re.IGNORECASE)
+ORDINAL_QUARTER_RE = re.compile(r"\b(first|second|third|fourth|1st|2nd|3rd|4th) quarter\b", re.IGNORECASE)
+FISCAL_YEAR_RE = re.compile(r"(?<![A-Za-z0-9])FY[\s_'‘’]*(\d{2})(?![0-9])", re.IGNORECASE)
+SPEAKER_RE = re.compile(r"^(\.?[A-Z][A-Za-z'.]*(?:\s+\.?[A-Z][A-Za-z'.]*){0,4})\s*:\s+(.*)$")
+NOISE_RE = re.compile(
+    r"^(Page \d+ of \d+|Bajaj Finserv Limited|[=\-]{3,}|"
+    r"(January|February|March|April|May|June|July|August|September|October|November|December) \d{1,2}, \d{4})$"
+)
+NOT_SPEAKERS = frozenset({"q", "a", "date", "note", "management", "moderator note", "participants", "disclaimer"})
+
+# Moderator lines that open the Q&A session and hand over to each analyst
+QA_START_RE = re.compile(r"question[\s\-]*and[\s\-]*answer|first question", re.IGNORECASE)
+NEXT_QUESTION_RE = re.compile(r"\b(first|next|last|follow[\s\-]*up) question\b|question (is )?from", re.IGNORECASE)
+HEADER_NAME_RE = re.compile(r"\bM(?:R|S|RS)\.?\s+", re.IGNORECASE)
+
+ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+# Subsidiary -> phrases that identify it in a transcript line, a speaker's role or a question.
+# "Bajaj Finance" alone is left out: users often write it when they mean Bajaj Finserv.
+SUBSIDIARIES = {
+    "BAGIC": ("bagic", "general insurance", "allianz general"),
+    "BALIC": ("balic", "life insurance", "allianz life"),
+    "Bajaj Finance": ("bfl",),
+    "Bajaj Housing Finance": ("housing finance", "bhfl", "bajaj housing"),
+    "Bajaj Finserv Health": ("finserv health", "healthtech", "health tech", "vidal", "tpa"),
+    "Bajaj Finserv Direct": ("finserv direct", "bajaj markets", "marketplace"),
+    "Bajaj Finserv AMC": ("amc", "asset management"),
+    "Bajaj Broking": ("broking", "margin trade")
+}
+SUBSIDIARY_RES = {
+    name: re.compile(r"\b(" + "|".join(re.escape(phrase) for phrase in phrases) + r")\b", re.IGNORECASE)
+    for name, phrases in SUBSIDIARIES.items()
+}
+
+def quarter_label(match):
+    return f"Q{match.group(1)} FY{match.group(2)}"
+
+def quarter_tags(quarter):
+    """'Q2 FY25' -> {"quarter": "Q2 FY25", "fiscal_quarter": "Q2", "fiscal_year": "FY25"}"""
+    if not quarter:
+        return {"quarter": None, "fiscal_quarter": None, "fiscal_year": None}
+    fiscal_quarter, fiscal_year = quarter.split()
+    return {"quarter": quarter, "fiscal_quarter": fiscal_quarter, "fiscal_year": fiscal_year}
+
+def normalise_speaker(name):
+    """'S .Sreenivasan', 'S Sreenivasan' and 'S. Sreenivasan' all become 'S. Sreenivasan'"""
+    name = " ".join(re.sub(r"\s*\.\s*", ". ", name).split())
+    name = re.sub(r"\b([A-Z])\b(?!\.)", r"\1.", name)
+    return name.title() if name.isupper() else name
+
+def speaker_key(name):
+    # Surnames survive the variations between calls ("Ramandeep S Sahni", "Ramandeep Sahni")
+    return name.replace(".", " ").split()[-1].lower() if name and name.strip(" .") else None
+
+def subsidiaries_in(text):
+    """Subsidiaries named in a piece of text, in SUBSIDIARIES order"""
+    return [name for name, pattern in SUBSIDIARY_RES.items() if pattern.search(text)]
+
+def is_transcript(path):
+    """Earnings call transcripts are text files with the quarter in their name"""
+    return Path(path).suffix.lower() == ".txt" and QUARTER_RE.search(Path(path).stem) is not None
+
+def header_roles(header_lines):
+    """Map speaker surname -> subsidiaries from the MANAGEMENT block at the top of a call"""
+    roles = {}
+    for entry in HEADER_NAME_RE.split(" ".join(header_lines))[1:]:
+        name, _, role = entry.partition("–")
+        if not role:
+            name, _, role = entry.partition(" - ")
+        key = speaker_key(name.strip())
+        if key:
+            roles[key] = subsidiaries_in(role)
+    return roles
+
+def parse_transcript(path):
+    """
+    Return the speaker turns of a transcript as dicts with text, speaker, section
+    ("presentation" or "qa"), exchange (the analyst question a Q&A turn belongs to),
+    quarter, fiscal_quarter, fiscal_year, subsidiaries, speaker_subsidiaries (from the
+    speaker's role) and source.
+    """
+    text = Path(path).read_text(encoding="utf-8", errors="ignore")
+    file_quarter = QUARTER_RE.search(Path(path).stem)
+    quarter = quarter_label(file_quarter) if file_quarter else None
+
+    turns = []
+    header = []
+    speaker, lines = None, []
+    section, exchange = "presentation", None
+
+    def flush():
+        if lines:
+            turns.append({"quarter": quarter, "speaker": speaker, "section": section,
+                          "exchange": exchange, "text": " ".join(lines)})
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or NOISE_RE.match(line):
+            continue
+
+        # Multi-quarter files announce each quarter in a heading
+        heading = QUARTER_RE.search(line)
+        if not file_quarter and heading and line.upper() == line:
+            flush()
+            speaker, lines = None, []
+            section, exchange = "presentation", None
+            quarter = quarter_label(heading)
+
+        match = SPEAKER_RE.match(line)
+        if match and match.group(1).strip().lower() not in NOT_SPEAKERS:
+            flush()
+            speaker = normalise_speaker(match.group(1))
+            lines = [match.group(2)]
+            if speaker.lower() == "moderator":
+                if section == "presentation" and QA_START_RE.search(line):
+                    section, exchange = "qa", 0
+                if section == "qa" and NEXT_QUESTION_RE.search(line):
+                    exchange += 1
+        else:
+            if speaker is None:
+                header.append(line)
+            lines.append(line)
+    flush()
+
+    roles = header_roles(header)
+    question_subsidiaries = {}
+    for turn in turns:
+        mentioned = subsidiaries_in(turn["text"])
+        turn["speaker_subsidiaries"] = roles.get(speaker_key(turn["speaker"]), [])
+        own = set(mentioned) | set(turn["speaker_subsidiaries"])
+        key = (turn["quarter"], turn["exchange"])
+        if turn["section"] == "qa" and key not in question_subsidiaries and turn["speaker"] != "Moderator":
+            # The analyst's question sets the topic for the answers that follow it
+            question_subsidiaries[key] = mentioned
+        if not own and turn["section"] == "qa":
+            own = set(question_subsidiaries.get(key, []))
+        turn["subsidiaries"] = [name for name in SUBSIDIARIES if name in own]
+        turn.update(quarter_tags(turn["quarter"]))
+        turn["source"] = Path(path).name
+    return turns
+
+def part_subsidiaries(turn, text):
+    """Subsidiaries for a window of a long turn: those it names, else the whole turn's"""
+    mentioned = set(subsidiaries_in(text))
+    if not mentioned:
+        return turn["subsidiaries"]
+    mentioned |= set(turn["speaker_subsidiaries"])
+    return [name for name in SUBSIDIARIES if name in mentioned]
+
+def question_filters(query):
+    """
+    Metadata filters for the quarter, fiscal year and subsidiaries a question names, as
+    {key: [accepted values]}; every key must match, any value within a key may.
+    """
+    filters = {}
+    quarters = list(dict.fromkeys(quarter_label(match) for match in QUARTER_RE.finditer(query)))
+    if quarters:
+        filters["quarter"] = quarters
+    else:
+        fiscal_quarters = [f"Q{match.group(1)}" for match in BARE_QUARTER_RE.finditer(query)]
+        fiscal_quarters += [f"Q{ORDINALS[match.group(1).lower()]}" for match in ORDINAL_QUARTER_RE.finditer(query)]
+        if fiscal_quarters:
+            filters["fiscal_quarter"] = list(dict.fromkeys(fiscal_quarters))
+        fiscal_years = list(dict.fromkeys(f"FY{match.group(1)}" for match in FISCAL_YEAR_RE.finditer(query)))
+        if fiscal_years:
+            filters["fiscal_year"] = fiscal_years
+
+    subsidiaries = subsidiaries_in(query)
+    if subsidiaries:
+        filters["subsidiaries"] = subsidiaries
+    return filters
+
+def matches_filters(metadata, filters):
+    """True if a turn, passage or node's metadata satisfies question_filters output"""
+    for key, accepted in filters.items():
+        value = metadata.get(key)
+        if key == "subsidiaries":
+            if not value or not any(name in value for name in accepted):
+                return False
+        elif value not in accepted:
+            return False
+    return True
+
+def main():
+    for path in sys.argv[1:]:
+        for turn in parse_transcript(path):
+            print(json.dumps(dict(turn, text=turn["text"][:80]), ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()